@@ -0,0 +1,282 @@
+
+import collections
+import multiprocessing
+
+import numpy as np
+
+"""
+Sampling based inference for networks too dense for exact inference. Both
+samplers are vectorized across many particles (or chains) at once using the
+batched TabularCPD operations, and can split the work across a process pool
+with an independent seed per worker.
+"""
+
+# marginals: dict mapping each unobserved variable to its estimated
+#   distribution given the evidence
+# ess: dict mapping each variable to its effective sample size (the smallest
+#   over its values)
+# rhat: dict mapping each variable to its potential scale reduction factor
+#   (the largest over its values), None for likelihood weighting
+# num_samples: number of samples (particles or post burn-in sweeps times
+#   chains) the estimate is based on
+Estimate = collections.namedtuple('Estimate',
+    ['marginals', 'ess', 'rhat', 'num_samples'])
+
+def _map(worker, tasks, processes):
+    if processes is None:
+        return [worker(task) for task in tasks]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(worker, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+def _seed(seed, *keys):
+    # independent, reproducible stream per (seed, round, worker), or fresh
+    # entropy if there is no seed
+    if seed is None:
+        return None
+    return np.random.SeedSequence([seed] + list(keys))
+
+"""
+Likelihood weighting
+"""
+
+def _lw_worker(args):
+    tabular, evidence, n, seed = args
+    rng = np.random.default_rng(seed)
+    columns = {}
+    logw = np.zeros(n)
+    for cpd in tabular:
+        if cpd.variable in evidence:
+            columns[cpd.variable] = np.full(n, evidence[cpd.variable])
+            logw += cpd.logpdf_batch(columns)
+        else:
+            columns[cpd.variable] = cpd.sample_batch(columns, rng, n)
+
+    # weights relative to the largest so that partial sums can be merged
+    shift = logw.max() if n > 0 else 0.
+    if not np.isfinite(shift):
+        shift = 0.
+    w = np.exp(logw - shift)
+    counts = {cpd.variable: np.bincount(columns[cpd.variable], weights=w,
+        minlength=cpd.cardinality) for cpd in tabular
+        if cpd.variable not in evidence}
+    return shift, counts, w.sum(), (w ** 2).sum()
+
+def likelihood_weighting(network, evidence, num_samples=100000,
+        batch_size=100000, processes=None, seed=None, min_ess=None,
+        max_rounds=100):
+    """
+    Description:
+        - Estimate P(X | evidence) for every unobserved X by likelihood
+            weighting: unobserved variables are sampled in topological order
+            with evidence variables fixed, and each particle is weighted by
+            the likelihood of the evidence given its parents.
+
+    Args:
+        - network: BayesianNetwork whose cpds can be converted to tabular
+        - evidence: dict mapping observed variables to their values
+        - num_samples: number of particles
+        - batch_size: particles per task; tasks run in processes workers
+        - processes: if given, number of worker processes
+        - seed: int seed; each task draws from its own spawned stream
+        - min_ess: if given, keep drawing rounds of num_samples particles
+            until the effective sample size (sum w)^2 / sum w^2 reaches it
+        - max_rounds: maximum number of rounds drawn for min_ess; the estimate
+            (and its ess) after the last one is returned even if min_ess was
+            not reached, and ValueError raised if every particle drawn had
+            zero weight
+    """
+    tabular = network.tabular_cpds()
+    total_shift, counts, sum_w, sum_w2 = None, {}, 0., 0.
+    drawn = 0
+    round_ = 0
+    while True:
+        sizes = [min(batch_size, num_samples - start)
+            for start in range(0, num_samples, batch_size)]
+        tasks = [(tabular, evidence, size, _seed(seed, round_, k))
+            for (k, size) in enumerate(sizes)]
+        for (shift, c, sw, sw2) in _map(_lw_worker, tasks, processes):
+            if sw == 0:
+                continue
+            # rescale everything to the largest shift seen so far
+            if total_shift is None or shift > total_shift:
+                scale = (np.exp(total_shift - shift)
+                    if total_shift is not None else 0.)
+                counts = {v: counts[v] * scale for v in counts}
+                sum_w, sum_w2 = sum_w * scale, sum_w2 * scale ** 2
+                total_shift = shift
+            scale = np.exp(shift - total_shift)
+            for v in c:
+                counts[v] = counts.get(v, 0.) + c[v] * scale
+            sum_w += sw * scale
+            sum_w2 += sw2 * scale ** 2
+        drawn += num_samples
+        round_ += 1
+        # rare evidence may only get weight in a later round, so give up on
+        # all weights being zero only once no more rounds are to be drawn
+        last = min_ess is None or round_ >= max_rounds
+        if sum_w == 0:
+            if last:
+                raise ValueError("every particle has zero weight, the "
+                    "evidence may be impossible")
+            continue
+        ess = sum_w ** 2 / sum_w2
+        if last or ess >= min_ess:
+            break
+
+    marginals = {v: counts[v] / sum_w for v in counts}
+    return Estimate(marginals, {v: ess for v in marginals}, None, drawn)
+
+"""
+Gibbs sampling
+"""
+
+def _gibbs_worker(args):
+    tabular, children, evidence, state, sweeps, batch_size, seed = args
+    rng = np.random.default_rng(seed)
+    cpds = {cpd.variable: cpd for cpd in tabular}
+    free = [cpd.variable for cpd in tabular if cpd.variable not in evidence]
+    num_chains = len(next(iter(state.values())))
+    # no counts are kept (e.g., during burn in) if batch_size is None
+    num_batches = sweeps // batch_size if batch_size is not None else 0
+    counts = {v: np.zeros((num_chains, num_batches, cpds[v].cardinality))
+        for v in free}
+    chains = np.arange(num_chains)
+
+    for sweep in range(sweeps):
+        batch = sweep // batch_size if batch_size is not None else 0
+        for v in free:
+            cpd = cpds[v]
+            # log P(v = x | markov blanket) for each value x and every chain
+            logp = np.empty((num_chains, cpd.cardinality))
+            for x in range(cpd.cardinality):
+                state[v] = np.full(num_chains, x)
+                logp[:, x] = cpd.logpdf_batch(state)
+                for child in children[v]:
+                    logp[:, x] += cpds[child].logpdf_batch(state)
+            top = logp.max(axis=1, keepdims=True)
+            top[~np.isfinite(top)] = 0.
+            p = np.exp(logp - top)
+            cdf = np.cumsum(p, axis=1)
+            u = rng.random(num_chains) * cdf[:, -1]
+            values = np.minimum((u[:, np.newaxis] >= cdf).sum(axis=1),
+                cpd.cardinality - 1)
+            state[v] = values
+            if batch < num_batches:
+                counts[v][chains, batch, values] += 1
+    return state, counts
+
+def _initial_state(tabular, evidence, num_chains, rng):
+    # forward sample with the evidence clamped
+    state = {}
+    for cpd in tabular:
+        if cpd.variable in evidence:
+            state[cpd.variable] = np.full(num_chains, evidence[cpd.variable])
+        else:
+            state[cpd.variable] = cpd.sample_batch(state, rng, num_chains)
+    return state
+
+def _diagnostics(counts, batch_size):
+    """
+    Description:
+        - Return the marginal, effective sample size and rhat of a variable
+            from its per chain, per batch counts of shape (chains, batches,
+            cardinality).
+    """
+    m, b, _ = counts.shape
+    n = b * batch_size
+    chain_means = counts.sum(axis=1) / n
+    marginal = chain_means.mean(axis=0)
+
+    # rhat of the indicator of each value, within chain variances from counts
+    within = (chain_means * (1 - chain_means) * n / max(n - 1, 1)).mean(axis=0)
+    between = n * chain_means.var(axis=0, ddof=1) if m > 1 else 0.
+    pooled = (n - 1.) / n * within + between / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rhat = np.where(within > 0, np.sqrt(pooled / within),
+            np.where(pooled > 0, np.inf, 1.))
+
+    # effective sample size from the variance of batch means
+    batch_means = (counts / batch_size).reshape(m * b, -1)
+    variance = marginal * (1 - marginal)
+    asymptotic = batch_size * batch_means.var(axis=0, ddof=1) if m * b > 1 \
+        else variance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ess = np.where(asymptotic > 0, m * n * variance / asymptotic, m * n)
+    ess = np.minimum(ess, m * n)
+    return marginal, float(ess.min()), float(rhat.max())
+
+def gibbs(network, evidence, num_chains=16, num_sweeps=2000, burn_in=200,
+        batch_size=50, check_every=None, rhat_threshold=1.01, min_ess=None,
+        processes=None, seed=None):
+    """
+    Description:
+        - Estimate P(X | evidence) for every unobserved X by Gibbs sampling.
+            Each sweep resamples every unobserved variable given its markov
+            blanket for all chains at once. Chains are split across workers
+            (each with its own seed), and per batch counts are kept so that
+            rhat (across chains) and a batch means effective sample size can
+            be reported.
+
+    Args:
+        - network: BayesianNetwork whose cpds can be converted to tabular
+        - evidence: dict mapping observed variables to their values
+        - num_chains: number of chains in total
+        - num_sweeps: maximum number of sweeps after burn in
+        - burn_in: sweeps discarded at the start of every chain
+        - batch_size: sweeps per batch for the effective sample size
+        - check_every: if given, stop early once after some multiple of this
+            many sweeps every rhat is below rhat_threshold (and every
+            effective sample size reaches min_ess, if given)
+        - processes: if given, number of worker processes (chains are split
+            evenly between them)
+        - seed: int seed
+    """
+    tabular = network.tabular_cpds()
+    children = {cpd.variable: [] for cpd in tabular}
+    for cpd in tabular:
+        for p in cpd.parents:
+            children[p].append(cpd.variable)
+    workers = max(1, min(processes or 1, num_chains))
+    splits = np.array_split(np.arange(num_chains), workers)
+    rng = np.random.default_rng(_seed(seed, 0))
+    states = [_initial_state(tabular, evidence, len(split), rng)
+        for split in splits]
+
+    def run(sweeps, keep, round_):
+        tasks = [(tabular, children, evidence, state, sweeps,
+            batch_size if keep else None, _seed(seed, round_, k))
+            for (k, state) in enumerate(states)]
+        return _map(_gibbs_worker, tasks, processes)
+
+    if burn_in > 0:
+        states = [state for (state, _) in run(burn_in, False, 1)]
+
+    check_every = check_every or num_sweeps
+    check_every = max(batch_size, check_every // batch_size * batch_size)
+    counts = None
+    done, round_ = 0, 2
+    while done < num_sweeps:
+        sweeps = min(check_every, num_sweeps - done)
+        sweeps = max(batch_size, sweeps // batch_size * batch_size)
+        results = run(sweeps, True, round_)
+        states = [state for (state, _) in results]
+        new = {v: np.concatenate([c[v] for (_, c) in results])
+            for v in results[0][1]}
+        counts = new if counts is None else {v: np.concatenate(
+            (counts[v], new[v]), axis=1) for v in counts}
+        done += sweeps
+        round_ += 1
+
+        marginals, ess, rhat = {}, {}, {}
+        for v in counts:
+            marginals[v], ess[v], rhat[v] = _diagnostics(counts[v], batch_size)
+        converged = all(r < rhat_threshold for r in rhat.values()) and (
+            min_ess is None or all(e >= min_ess for e in ess.values()))
+        if converged:
+            break
+
+    return Estimate(marginals, ess, rhat, done * num_chains)
@@ -1,5 +1,10 @@
 
+import multiprocessing
+
+import numpy as np
+
 import cpds
+import variable_elimination
 
 class BayesianNetwork(object):
     def __init__(self, graph, cpds):
@@ -11,6 +16,11 @@ class BayesianNetwork(object):
         """
         self.graph = graph
         self.cpds = cpds
+        self._tabular_cpds = None
+        self._inference = None
+        self._markov_blankets = None
+        # ancestors of the last evidence set seen by d_separated
+        self._evidence_ancestors = (None, None)
 
     def pdf(self, assignment):
         prob = 1.
@@ -22,4 +32,239 @@ class BayesianNetwork(object):
         logprob = 0.
         for cpd in self.cpds:
             logprob += cpd.logpdf(assignment)
-        return logprob
\ No newline at end of file
+        return logprob
+
+    def tabular_cpds(self):
+        """
+        Description:
+            - Return the cpds converted to TabularCPDs, converting on first use.
+        """
+        if self._tabular_cpds is None:
+            self._tabular_cpds = [cpd.to_tabular() for cpd in self.cpds]
+        return self._tabular_cpds
+
+    def query(self, variables, evidence=None):
+        """
+        Description:
+            - Return P(variables | evidence) as an array with one axis per
+                query variable, computed exactly by variable elimination (see
+                variable_elimination.VariableElimination).
+
+        Args:
+            - variables: list of query variables
+            - evidence: dict mapping observed variables to their values
+        """
+        if self._inference is None:
+            self._inference = variable_elimination.VariableElimination(self)
+        return self._inference.query(variables, evidence)
+
+    def markov_blanket(self, variable):
+        """
+        Description:
+            - Return the markov blanket of variable (its parents, children, and
+                the children's other parents) as a frozenset. The blankets of
+                all variables are computed together on first use.
+        """
+        if self._markov_blankets is None:
+            pred, succ = self.graph.pred, self.graph.succ
+            self._markov_blankets = {}
+            for v in self.graph:
+                blanket = set(pred[v]) | set(succ[v])
+                for child in succ[v]:
+                    blanket.update(pred[child])
+                blanket.discard(v)
+                self._markov_blankets[v] = frozenset(blanket)
+        return self._markov_blankets[variable]
+
+    def _ancestors(self, given):
+        # given and all of its ancestors, remembered for the last evidence set
+        key = frozenset(given)
+        if self._evidence_ancestors[0] != key:
+            ancestors = set(key)
+            stack = list(key)
+            while stack:
+                for parent in self.graph.pred[stack.pop()]:
+                    if parent not in ancestors:
+                        ancestors.add(parent)
+                        stack.append(parent)
+            self._evidence_ancestors = (key, ancestors)
+        return self._evidence_ancestors[1]
+
+    def reachable(self, sources, given=()):
+        """
+        Description:
+            - Return the variables not in given that are d-connected to any of
+                sources given the variables in given, by Bayes-ball: a walk over
+                (variable, direction) pairs that passes through an unobserved
+                variable in any direction except from a parent back up to a
+                parent, and through an observed one (or one with an observed
+                descendant, i.e., an ancestor of given) only from a parent to a
+                parent. O(V + E) per call.
+
+        Args:
+            - sources: variable or list of variables
+            - given: observed variables
+        """
+        if sources in self.graph:
+            sources = [sources]
+        given = set(given)
+        ancestors = self._ancestors(given)
+        pred, succ = self.graph.pred, self.graph.succ
+
+        # 'up' means arriving from a child, 'down' from a parent
+        visited = set()
+        stack = [(v, 'up') for v in sources]
+        reachable = set()
+        while stack:
+            v, direction = stack.pop()
+            if (v, direction) in visited:
+                continue
+            visited.add((v, direction))
+            if v not in given:
+                reachable.add(v)
+            if direction == 'up' and v not in given:
+                stack.extend((p, 'up') for p in pred[v])
+                stack.extend((c, 'down') for c in succ[v])
+            elif direction == 'down':
+                if v not in given:
+                    stack.extend((c, 'down') for c in succ[v])
+                if v in ancestors:
+                    stack.extend((p, 'up') for p in pred[v])
+        return reachable
+
+    def d_separated(self, x, y, given=()):
+        """
+        Description:
+            - Return whether x and y (variables or lists of variables) are
+                d-separated given the variables in given.
+        """
+        ys = [y] if y in self.graph else list(y)
+        given = set(given)
+        if given & set(ys) or given & set([x] if x in self.graph else x):
+            raise ValueError("query variables cannot also be evidence")
+        reachable = self.reachable(x, given)
+        return not any(v in reachable for v in ys)
+
+    def d_separated_batch(self, pairs, given=()):
+        """
+        Description:
+            - Return, for each (x, y) pair of variables, whether they are
+                d-separated given the same evidence. The ancestors of the
+                evidence are computed once, and one walk is made per distinct
+                x rather than per pair.
+        """
+        given = set(given)
+        reachable = {}
+        results = []
+        for (x, y) in pairs:
+            if x in given or y in given:
+                raise ValueError("query variables cannot also be evidence")
+            if x not in reachable:
+                reachable[x] = self.reachable(x, given)
+            results.append(y not in reachable[x])
+        return results
+
+    def loglik(self, data, per_row=False, chunk_size=100000, processes=None):
+        """
+        Description:
+            - Return the log likelihood of each row of a dataset (or their sum).
+                Rows are scored chunk_size at a time with one vectorized gather
+                per cpd per chunk, so memory is bounded by the chunk size
+                rather than the dataset size.
+
+        Args:
+            - data: a structured array (including an np.memmap of one) with a
+                field per variable, or a dict mapping each variable to an
+                integer array of its values
+            - per_row: if True, return an array with the log likelihood of
+                each row rather than their sum
+            - chunk_size: number of rows scored at a time
+            - processes: if given, score chunks across this many worker
+                processes
+        """
+        tabular = self.tabular_cpds()
+        variables = [cpd.variable for cpd in tabular]
+        num_rows = len(data[variables[0]])
+        chunks = (_columns(data, variables, start, start + chunk_size)
+            for start in range(0, num_rows, chunk_size))
+
+        if processes is not None:
+            # the cpds are sent to each worker once, tasks only carry columns
+            pool = multiprocessing.Pool(processes, _init_worker, (tabular,))
+            scores = pool.imap(_score_chunk, chunks)
+        else:
+            pool = None
+            scores = (_score(tabular, columns) for columns in chunks)
+
+        try:
+            if per_row:
+                out = np.empty(num_rows)
+                start = 0
+                for score in scores:
+                    out[start:start + len(score)] = score
+                    start += len(score)
+                return out
+            return sum(score.sum() for score in scores)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def sample(self, n, rng=None):
+        """
+        Description:
+            - Return n rows drawn from the network as a structured array with
+                an integer field per variable. Variables are sampled in the
+                (topological) order of the cpds, all n values of a variable at
+                once given the already sampled columns of its parents.
+
+        Args:
+            - n: number of rows
+            - rng: np.random.Generator or seed (default a fresh generator)
+        """
+        return next(self.sample_chunks(n, max(n, 1), rng))
+
+    def sample_chunks(self, n, chunk_size=100000, rng=None):
+        """
+        Description:
+            - Generator of structured arrays of at most chunk_size rows (see
+                sample), totaling n rows, so that memory stays bounded by the
+                chunk size.
+        """
+        rng = np.random.default_rng(rng)
+        tabular = self.tabular_cpds()
+        dtype = np.dtype([(cpd.variable, _value_dtype(cpd.cardinality))
+            for cpd in tabular])
+        # a single empty chunk if n is 0
+        for start in range(0, max(n, 1), chunk_size):
+            size = min(chunk_size, n - start)
+            chunk = np.empty(size, dtype=dtype)
+            for cpd in tabular:
+                chunk[cpd.variable] = cpd.sample_batch(chunk, rng, size)
+            yield chunk
+
+def _value_dtype(cardinality):
+    for dtype in (np.int8, np.int16, np.int32):
+        if cardinality <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def _columns(data, variables, start, end):
+    # read the rows [start, end) of each variable's column into memory
+    return {v: np.asarray(data[v][start:end]) for v in variables}
+
+# the tabular cpds as seen by a worker process, set by _init_worker
+_tabular = None
+
+def _init_worker(tabular):
+    global _tabular
+    _tabular = tabular
+
+def _score_chunk(columns):
+    return _score(_tabular, columns)
+
+def _score(tabular, columns):
+    score = np.zeros(len(columns[tabular[0].variable]))
+    for cpd in tabular:
+        score += cpd.logpdf_batch(columns)
+    return score
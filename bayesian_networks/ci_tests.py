@@ -0,0 +1,242 @@
+
+import collections
+import mmap
+
+import numpy as np
+import scipy.stats
+
+import learning
+
+"""
+Conditional independence tests on discrete data, for learning structure with
+p_map.build_skeleton. Contingency tables are counted with np.bincount on the
+encoded columns in a streaming pass over the data, and cached by variable
+subset; the table of a subset is summed from the smallest cached table of a
+superset whenever there is one, so only new combinations of variables cost a
+pass over the data.
+"""
+
+# statistic: the G or chi-square statistic
+# dof: degrees of freedom, summed over the strata of the conditioning set
+#   that occur in the data
+# p_value: probability of a statistic at least as large under independence
+TestResult = collections.namedtuple('TestResult',
+    ['statistic', 'dof', 'p_value'])
+
+class _MappedArray(object):
+    """
+    Description:
+        - Pickled stand in for a C contiguous view of a memory mapped file:
+            the file name, the offset of the view in it, and its dtype and
+            shape, so that unpickling maps the same pages again.
+    """
+    def __init__(self, filename, offset, dtype, shape):
+        self.filename = filename
+        self.offset = offset
+        self.dtype = dtype
+        self.shape = shape
+
+    @staticmethod
+    def wrap(array):
+        # the array itself unless it is a view of a file mapping
+        if (not isinstance(array, np.ndarray) or not array.size
+                or not array.flags.c_contiguous):
+            return array
+        root = array
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        if not (isinstance(root, np.memmap) and root.filename
+                and isinstance(root.base, mmap.mmap)):
+            return array
+        # slices of a memmap keep its offset, so locate the view by address
+        offset = root.offset + (array.__array_interface__['data'][0] -
+            root.__array_interface__['data'][0])
+        return _MappedArray(root.filename, offset, array.dtype, array.shape)
+
+    @staticmethod
+    def unwrap(array):
+        if not isinstance(array, _MappedArray):
+            return array
+        return np.memmap(array.filename, dtype=array.dtype, mode='r',
+            offset=array.offset, shape=array.shape)
+
+class CITest(object):
+    """
+    Description:
+        - Independence oracle X ⊥ Y | Z from data by a G-test (likelihood
+            ratio) or Pearson chi-square test, deciding independence when the
+            p-value exceeds alpha. Pass it to p_map.build_skeleton in place of
+            an indps dict.
+    """
+    def __init__(self, data, cardinalities=None, method='g', alpha=0.05,
+            chunk_size=100000, cache_size=None):
+        """
+        Args:
+            - data: a structured array (e.g., an np.memmap), the path of a .npy
+                file holding one (memory mapped), or a dict mapping each
+                variable to an integer array (which may be memory mapped)
+            - cardinalities: dict mapping each variable to its number of
+                values (default one more than its largest value, found in a
+                pass over the data)
+            - method: 'g' or 'chi2'
+            - alpha: significance level
+            - chunk_size: number of rows read at a time
+            - cache_size: optional maximum number of cached count tables
+
+        A pickled CITest (e.g., sent to p_map.build_skeleton's workers) refers
+        to memory mapped data by file name and offset, which is mapped again
+        on unpickling, rather than copying it; other data is pickled as is.
+        """
+        if method not in ('g', 'chi2'):
+            raise ValueError("unknown method {}".format(method))
+        if isinstance(data, str):
+            data = np.load(data, mmap_mode='r')
+        self.data = data
+        self.variables = (list(data.keys()) if isinstance(data, dict)
+            else list(data.dtype.names))
+        self.method = method
+        self.alpha = alpha
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        if cardinalities is None:
+            cardinalities = dict((v, 0) for v in self.variables)
+            for chunk in self._chunks():
+                for v in self.variables:
+                    if len(chunk[v]):
+                        cardinalities[v] = max(cardinalities[v],
+                            int(np.max(chunk[v])) + 1)
+        self.cardinalities = dict(cardinalities)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if isinstance(self.data, dict):
+            state['data'] = {v: _MappedArray.wrap(a)
+                for (v, a) in self.data.items()}
+        else:
+            state['data'] = _MappedArray.wrap(self.data)
+        return state
+
+    def __setstate__(self, state):
+        data = state['data']
+        if isinstance(data, dict):
+            state['data'] = {v: _MappedArray.unwrap(a) for (v, a) in data.items()}
+        else:
+            state['data'] = _MappedArray.unwrap(data)
+        self.__dict__.update(state)
+
+    def _chunks(self):
+        if isinstance(self.data, dict):
+            num_rows = len(self.data[self.variables[0]])
+            for start in range(0, num_rows, self.chunk_size):
+                yield {v: np.asarray(self.data[v][start:start + self.chunk_size])
+                    for v in self.variables}
+        else:
+            for chunk in learning.iter_chunks(self.data, self.chunk_size):
+                yield chunk
+
+    def _shape(self, variables):
+        return tuple(self.cardinalities[v] for v in variables)
+
+    def _store(self, key, counts):
+        self.cache[key] = counts
+        if self.cache_size is not None and len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _cached(self, key):
+        # counts over key, axes in sorted order, from the cache if possible
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        supersets = [k for k in (key | frozenset([v])
+            for v in self.variables if v not in key) if k in self.cache]
+        if not supersets:
+            # only scan the cache when no table one variable larger is left
+            supersets = [k for k in self.cache if key < k]
+        if not supersets:
+            return None
+        source = min(supersets, key=lambda k: self.cache[k].size)
+        order = sorted(source, key=str)
+        counts = self.cache[source].sum(axis=tuple(
+            axis for (axis, v) in enumerate(order) if v not in key))
+        self._store(key, counts)
+        return counts
+
+    def prefetch(self, subsets):
+        """
+        Description:
+            - Count, in a single pass over the data, the tables of those
+                variable subsets that cannot be derived from cached ones. Only
+                the subsets not contained in another are counted.
+        """
+        keys = set(frozenset(s) for s in subsets)
+        keys = [k for k in keys if self._cached(k) is None]
+        maximal = [k for k in keys if not any(k < other for other in keys)]
+        if not maximal:
+            return
+        orders = [sorted(k, key=str) for k in maximal]
+        tables = [np.zeros(self._shape(order), dtype=np.int64)
+            for order in orders]
+        for chunk in self._chunks():
+            for (order, table) in zip(orders, tables):
+                index = np.ravel_multi_index([np.asarray(chunk[v])
+                    for v in order], table.shape)
+                table += np.bincount(index, minlength=table.size).reshape(
+                    table.shape)
+        for (key, table) in zip(maximal, tables):
+            self._store(key, table)
+
+    def counts(self, variables):
+        """
+        Description:
+            - Return the contingency table of variables, with axes in the
+                given order.
+        """
+        variables = tuple(variables)
+        key = frozenset(variables)
+        counts = self._cached(key)
+        if counts is None:
+            self.prefetch([key])
+            counts = self.cache[key]
+        order = sorted(key, key=str)
+        return counts.transpose([order.index(v) for v in variables])
+
+    def test(self, x, y, given=()):
+        """
+        Description:
+            - Return the TestResult of X ⊥ Y | given.
+        """
+        given = tuple(given)
+        n = self.counts((x, y) + given).reshape(self.cardinalities[x],
+            self.cardinalities[y], -1).astype(float)
+        n_xz = n.sum(axis=1, keepdims=True)
+        n_yz = n.sum(axis=0, keepdims=True)
+        n_z = n_xz.sum(axis=0, keepdims=True)
+        expected = n_xz * n_yz / np.where(n_z > 0, n_z, 1)
+        if self.method == 'g':
+            terms = n * np.log(np.where(n > 0, n, 1) /
+                np.where(expected > 0, expected, 1))
+            statistic = 2 * terms.sum()
+        else:
+            statistic = ((n - expected) ** 2 /
+                np.where(expected > 0, expected, 1)).sum()
+
+        # values of x and y that occur within each stratum of z
+        rows = (n_xz[:, 0] > 0).sum(axis=0)
+        cols = (n_yz[0] > 0).sum(axis=0)
+        dof = int((np.maximum(rows - 1, 0) * np.maximum(cols - 1, 0)).sum())
+        p_value = scipy.stats.chi2.sf(statistic, dof) if dof > 0 else 1.
+        return TestResult(float(statistic), dof, float(p_value))
+
+    def test_batch(self, queries):
+        """
+        Description:
+            - Return the TestResult of each (x, y, given) query, counting every
+                missing table in one pass over the data.
+        """
+        queries = [(x, y, tuple(given)) for (x, y, given) in queries]
+        self.prefetch([(x, y) + given for (x, y, given) in queries])
+        return [self.test(x, y, given) for (x, y, given) in queries]
+
+    def independent(self, x, y, given=()):
+        return self.test(x, y, given).p_value > self.alpha
@@ -49,6 +49,17 @@ class StaticCPD(CPD):
     def logpdf(self, assignment):
         return np.log(self.pdf(assignment))
 
+    def to_tabular(self):
+        """
+        Description:
+            - Return an equivalent TabularCPD, which requires a categorical
+                distribution.
+        """
+        if not isinstance(self.distribution, CategoricalDistribution):
+            raise ValueError("cannot tabulate {} without a categorical "
+                "distribution".format(self.variable))
+        return TabularCPD(self.variable, [], self.distribution.table)
+
 # discrete conditional probability distribution with parents
 class CategoricalCPD(CPD):
     def __init__(self, variable, parents, num_categories, distributions):
@@ -81,3 +92,119 @@ class CategoricalCPD(CPD):
 
     def logpdf(self, assignment):
         return np.log(self.pdf(assignment))
+
+    def to_tabular(self):
+        """
+        Description:
+            - Return an equivalent TabularCPD. The cardinality of each parent is
+                taken to be one more than the largest value it takes in the keys
+                of distributions, and every parental instantiation must have a
+                distribution.
+        """
+        keys = [k if isinstance(k, tuple) else (k,) for k in self.distributions]
+        parent_cards = tuple(max(k[i] for k in keys) + 1
+            for i in range(len(self.parents)))
+        card = max(len(d.table) for d in self.distributions.values())
+        table = np.zeros(parent_cards + (card,))
+        for key, dist in zip(keys, self.distributions.values()):
+            table[key][:len(dist.table)] = dist.table
+        if len(keys) != int(np.prod(parent_cards)):
+            raise ValueError("{} is missing distributions for some parental "
+                "instantiations".format(self.variable))
+        return TabularCPD(self.variable, self.parents, table)
+
+# discrete conditional probability distribution stored as a single array
+class TabularCPD(CPD):
+    def __init__(self, variable, parents, table):
+        """
+        Description:
+            - Holds the distribution for every parental instantiation in one
+                array along with its log, so scoring a row is an index rather
+                than building a key and looking up a distribution object, and
+                many rows can be scored with a single gather (logpdf_batch).
+
+        Args:
+            - variable: string, name of this node for this CPD
+            - parents: parent variables (list of strings)
+            - table: array of shape (parent_1 cardinality, ...,
+                parent_n cardinality, cardinality) s.t.,
+                table[parent_1_value, ..., parent_n_value] is the distribution 
+                of the variable given that parental instantiation
+        """
+        self.variable = variable
+        self.parents = list(parents)
+        self.table = np.asarray(table, dtype=float)
+        assert self.table.ndim == len(self.parents) + 1
+        assert np.allclose(self.table.sum(axis=-1), 1.)
+        self.cardinality = self.table.shape[-1]
+        self.parent_cardinalities = self.table.shape[:-1]
+        self._log_table = None
+        self._cumulative = None
+
+    @property
+    def log_table(self):
+        """
+        Description:
+            - The log of the table, computed on first use so that a table
+                backed by a memory mapped file is not read until needed.
+        """
+        if self._log_table is None:
+            with np.errstate(divide='ignore'):
+                self._log_table = np.log(self.table)
+        return self._log_table
+
+    @property
+    def cumulative(self):
+        """
+        Description:
+            - The cumulative distribution for every parental instantiation,
+                with the last entry of each set to exactly 1.
+        """
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.table, axis=-1)
+            self._cumulative[..., -1] = 1.
+        return self._cumulative
+
+    def pdf(self, assignment):
+        key = tuple(assignment[p] for p in self.parents)
+        return self.table[key + (assignment[self.variable],)]
+
+    def logpdf(self, assignment):
+        key = tuple(assignment[p] for p in self.parents)
+        return self.log_table[key + (assignment[self.variable],)]
+
+    def logpdf_batch(self, columns):
+        """
+        Description:
+            - Return the log probability of each of N rows.
+
+        Args:
+            - columns: dict (or structured array) mapping each variable name to
+                an integer array of its N values
+        """
+        key = tuple(np.asarray(columns[p]) for p in self.parents)
+        return self.log_table[key + (np.asarray(columns[self.variable]),)]
+
+    def sample_batch(self, columns, rng, n=None):
+        """
+        Description:
+            - Draw a value of the variable for each of N rows by inverse cdf
+                sampling: the cumulative distributions for the rows' parental
+                instantiations are gathered at once and each value is the
+                number of cumulative probabilities at or below a uniform draw.
+
+        Args:
+            - columns: dict (or structured array) mapping each parent name to
+                an integer array of its N values
+            - rng: np.random.Generator
+            - n: number of rows, required only if there are no parents
+        """
+        key = tuple(np.asarray(columns[p]) for p in self.parents)
+        if n is None:
+            n = len(key[0])
+        cdf = self.cumulative[key]
+        u = rng.random(n)
+        return (u[:, np.newaxis] >= cdf).sum(axis=-1)
+
+    def to_tabular(self):
+        return self
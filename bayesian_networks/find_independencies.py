@@ -1,4 +1,7 @@
 
+import collections
+import itertools
+
 import numpy as np
 
 def marginalize(table, i):
@@ -13,12 +16,144 @@ def marginalize_other(table, i, j):
     return table.sum(axis=tuple(marginal_axes))
 
 def cpd(table, i, given=None):
+    """
+    Description:
+        - Return P(X_i | given) from a joint table as an array with one axis
+            per given variable (in order) followed by one for X_i.
+    """
     if given is None:
         axes = list(range(len(table.shape)))
         axes.remove(i)
         return table.sum(axis=tuple(axes))
     else:
-        
+        return MarginalLattice(table).cpd(i, given)
+
+class MarginalLattice(object):
+    """
+    Description:
+        - Marginals of a joint table memoized by variable subset. A marginal is
+            summed from the smallest cached marginal over one more variable
+            (found by hashing, without scanning the cache), else from the
+            smallest cached marginal over any superset of its variables, and
+            from the full table only when no superset is cached.
+
+        - If cache_size is given, only that many marginals are kept, least
+            recently used first out.
+    """
+    def __init__(self, table, cache_size=None):
+        """
+        Args:
+            - table: joint table with one axis per variable
+            - cache_size: optional maximum number of cached marginals
+        """
+        self.table = np.asarray(table)
+        self.variables = frozenset(range(self.table.ndim))
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+
+    def _size(self, variables):
+        return np.prod([self.table.shape[v] for v in variables])
+
+    def _marginal(self, variables):
+        # marginal over the frozenset variables, axes in increasing order
+        if variables == self.variables:
+            return self.table
+        if variables in self.cache:
+            self.cache.move_to_end(variables)
+            return self.cache[variables]
+
+        supersets = [k for k in (variables | frozenset([v])
+            for v in self.variables - variables) if k in self.cache]
+        if not supersets:
+            # only scan the cache when no marginal one level up is left
+            supersets = [k for k in self.cache if variables < k]
+        source = min(supersets, key=self._size, default=self.variables)
+        axes = sorted(source)
+        marginal = self._marginal(source).sum(axis=tuple(
+            axis for (axis, v) in enumerate(axes) if v not in variables))
+
+        self.cache[variables] = marginal
+        if self.cache_size is not None and len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return marginal
+
+    def marginal(self, variables):
+        """
+        Description:
+            - Return the marginal table over variables (axis indices of the
+                joint), with axes in the given order.
+        """
+        variables = tuple(variables)
+        order = sorted(variables)
+        return self._marginal(frozenset(variables)).transpose(
+            [order.index(v) for v in variables])
+
+    def cpd(self, i, given=()):
+        """
+        Description:
+            - Return P(X_i | given), see cpd. Rows for zero probability
+                parental instantiations are zero.
+        """
+        joint = self.marginal(tuple(given) + (i,))
+        totals = joint.sum(axis=-1, keepdims=True)
+        return joint / np.where(totals > 0, totals, 1)
+
+    def independent(self, i, j, given=(), atol=1e-10):
+        """
+        Description:
+            - Return whether X_i and X_j are independent given the variables
+                in given, i.e., whether P(x, y, z) P(z) = P(x, z) P(y, z) for
+                every x, y and z (to within atol).
+        """
+        joint = self.marginal((i, j) + tuple(given))
+        p_yz = joint.sum(axis=0, keepdims=True)
+        p_xz = joint.sum(axis=1, keepdims=True)
+        return _independent(joint, p_xz, p_yz, p_xz.sum(axis=0, keepdims=True),
+            atol)
+
+def _independent(p_xyz, p_xz, p_yz, p_z, atol):
+    # P(x, y, z) P(z) = P(x, z) P(y, z) with the summed axes kept
+    return np.abs(p_xyz * p_z - p_xz * p_yz).max() <= atol
+
+def find_independencies(table, names=None, max_conditioning=None, atol=1e-10,
+        cache_size=None):
+    """
+    Description:
+        - Test every pairwise conditional independence X ⊥ Y | Z of a joint
+            table and return them in the format run_p_map takes: a dict
+            mapping each sorted pair of names to the list of conditioning
+            sets (sets of names, set(['.']) for the empty set) that separate
+            them. Subsets are visited from largest to smallest so that each
+            marginal is summed from a cached one.
+
+    Args:
+        - table: joint table with one axis per variable
+        - names: name of each variable (default its axis index)
+        - max_conditioning: optional maximum conditioning set size
+        - atol: tolerance of each independence test
+        - cache_size: see MarginalLattice
+    """
+    lattice = MarginalLattice(table, cache_size)
+    n = lattice.table.ndim
+    names = list(names) if names is not None else list(range(n))
+    largest = n - 2 if max_conditioning is None else min(max_conditioning,
+        n - 2)
+    indps = collections.defaultdict(list)
+    # every pair in a subset is tested given the rest of the subset from the
+    # subset's marginal, and the marginals with one variable summed out
+    for size in range(largest + 2, 1, -1):
+        for subset in itertools.combinations(range(n), size):
+            joint = lattice.marginal(subset)
+            without = [joint.sum(axis=a, keepdims=True) for a in range(size)]
+            for (a, b) in itertools.combinations(range(size), 2):
+                p_z = without[a].sum(axis=b, keepdims=True)
+                if _independent(joint, without[b], without[a], p_z, atol):
+                    i, j = subset[a], subset[b]
+                    key = tuple(sorted((names[i], names[j])))
+                    witness = set(names[v] for v in subset
+                        if v != i and v != j) or set(['.'])
+                    indps[key].append(witness)
+    return indps
 
 if __name__ == '__main__':
     # (a)
@@ -40,3 +175,8 @@ if __name__ == '__main__':
     c_cpd = cpd(table, 2)
     print('c_cpd: {}'.format(c_cpd))
     b_cpd = cpd(table, 1, (0,3))
+    print('b_cpd: {}'.format(b_cpd))
+
+    # (c)
+    indps = find_independencies(table, names=['A', 'B', 'C', 'D'])
+    print('independencies: {}'.format(dict(indps)))
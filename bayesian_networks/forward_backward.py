@@ -0,0 +1,247 @@
+
+import collections
+import multiprocessing
+
+import numpy as np
+
+from markov_chain_viterbi import pad_batch
+
+"""
+Forward-backward for HMMs, batched over sequences. Probabilities are kept
+scaled rather than in log space: each forward step is a matrix product
+normalized to sum to one, and the log likelihood is the sum of the logs of
+the normalizers. Transition matrices may be dense or sparse (anything with a
+tocsr method, holding log probabilities in its stored entries).
+"""
+
+def _probabilities(log_A):
+    if hasattr(log_A, 'tocsr'):
+        A = log_A.tocsr().copy()
+        A.data = np.exp(A.data)
+        return A
+    return np.exp(np.asarray(log_A, dtype=float))
+
+def _times(x, A):
+    # x @ A for a (N, S) array, written so that sparse A works too
+    return np.asarray(A.T.dot(x.T)).T
+
+def _times_transpose(x, A):
+    # x @ A.T
+    return np.asarray(A.dot(x.T)).T
+
+def _scaled_emissions(log_B):
+    # emission likelihoods scaled by their max over states at each step, and
+    # the logs of the scales
+    top = log_B.max(axis=-1, keepdims=True)
+    top[~np.isfinite(top)] = 0.
+    return np.exp(log_B - top), top[..., 0]
+
+def _forward_backward(log_pi, A, log_B, lengths, transitions=False):
+    """
+    Description:
+        - Return the (N, T, S) posteriors of a padded batch (zero past each
+            length), the (N,) log likelihoods and, if transitions, the (S, S)
+            expected transition counts summed over the batch.
+    """
+    N, T, S = log_B.shape
+    B, shift = _scaled_emissions(log_B)
+    alpha = np.empty((N, T, S))
+    log_c = np.zeros((N, T))
+
+    alpha[:, 0] = np.exp(log_pi) * B[:, 0]
+    c = alpha[:, 0].sum(axis=1)
+    alpha[:, 0] /= np.where(c > 0, c, 1)[:, np.newaxis]
+    log_c[:, 0] = np.log(c) + shift[:, 0]
+    for t in range(1, T):
+        active = t < lengths
+        new = _times(alpha[:, t - 1], A) * B[:, t]
+        c = np.where(active, new.sum(axis=1), 1.)
+        alpha[:, t] = np.where(active[:, np.newaxis],
+            new / np.where(c > 0, c, 1)[:, np.newaxis], alpha[:, t - 1])
+        log_c[:, t] = np.where(active, np.log(c) + shift[:, t], 0.)
+
+    # beta is one at and past the end of each sequence
+    posteriors = np.zeros((N, T, S))
+    beta = np.ones((N, S))
+    counts = np.zeros((S, S)) if transitions else None
+    for t in range(T - 1, -1, -1):
+        active = t < lengths
+        posteriors[active, t] = alpha[active, t] * beta[active]
+        if t == 0:
+            break
+        # weight of each state at t given the observations from t on
+        c = np.exp(log_c[:, t] - shift[:, t])
+        w = B[:, t] * beta / np.where(c > 0, c, 1)[:, np.newaxis]
+        w[~active] = 0.
+        if transitions:
+            counts += alpha[:, t - 1].T.dot(w)
+        beta = np.where(active[:, np.newaxis], _times_transpose(w, A), 1.)
+
+    if transitions:
+        counts = np.asarray(A.multiply(counts) if hasattr(A, 'multiply')
+            else A * counts)
+    return posteriors, log_c.sum(axis=1), counts
+
+def forward_backward(log_pi, log_A, log_B, lengths=None):
+    """
+    Description:
+        - Return the posterior state marginals P(s_t | o_1..T) and the log
+            likelihood log P(o_1..T) of one sequence or a batch of them.
+
+    Args:
+        - log_pi: (S,) log initial state probabilities
+        - log_A: (S, S) log transition probabilities, dense or sparse
+        - log_B: emission log likelihoods; a (T, S) array for one sequence, a
+            (N, T, S) array for a padded batch, or a list of (T_i, S) arrays
+        - lengths: length of each sequence of a padded batch (default T)
+
+    Returns:
+        - for one sequence, (T, S) posteriors and the log likelihood; for a
+            padded batch, (N, T, S) posteriors (zero past each length) and
+            (N,) log likelihoods; for a ragged batch, a list of posteriors and
+            (N,) log likelihoods
+    """
+    if isinstance(log_B, np.ndarray) and log_B.ndim == 2:
+        posteriors, loglik = forward_backward(log_pi, log_A,
+            log_B[np.newaxis])
+        return posteriors[0], loglik[0]
+    log_B, lengths, ragged = pad_batch(log_B, lengths)
+    posteriors, loglik, _ = _forward_backward(np.asarray(log_pi, dtype=float),
+        _probabilities(log_A), log_B, lengths)
+    if ragged:
+        return [posteriors[i, :n] for (i, n) in enumerate(lengths)], loglik
+    return posteriors, loglik
+
+class ForwardFilter(object):
+    """
+    Description:
+        - Online filtering of a single stream: after each observation,
+            P(s_t | o_1..t) and the running log likelihood, in O(S) memory.
+    """
+    def __init__(self, log_pi, log_A):
+        """
+        Args:
+            - log_pi: (S,) log initial state probabilities
+            - log_A: (S, S) log transition probabilities, dense or sparse
+        """
+        self.pi = np.exp(np.asarray(log_pi, dtype=float))
+        self.A = _probabilities(log_A)
+        self.belief = None
+        self.loglik = 0.
+
+    def predict(self):
+        """
+        Description:
+            - Return P(s_t+1 | o_1..t), the prior for the next observation.
+        """
+        if self.belief is None:
+            return self.pi
+        return _times(self.belief[np.newaxis], self.A)[0]
+
+    def push(self, log_b):
+        """
+        Description:
+            - Consume the emission log likelihoods (S,) of the next observation
+                and return the filtered distribution P(s_t | o_1..t).
+        """
+        b, shift = _scaled_emissions(np.asarray(log_b, dtype=float))
+        belief = self.predict() * b
+        c = belief.sum()
+        self.loglik += np.log(c) + shift
+        self.belief = belief / c if c > 0 else belief
+        return self.belief
+
+"""
+Baum-Welch for discrete emissions
+"""
+
+# initial: (S,) expected initial state counts
+# transitions: (S, S) expected transition counts
+# emissions: (S, M) expected emission counts
+# loglik: total log likelihood of the sequences
+Statistics = collections.namedtuple('Statistics',
+    ['initial', 'transitions', 'emissions', 'loglik'])
+
+def sufficient_statistics(pi, A, E, sequences):
+    """
+    Description:
+        - Return the expected sufficient statistics of a batch of discrete
+            observation sequences under an HMM. Statistics from disjoint
+            batches add up, so batches can be processed in parallel.
+
+    Args:
+        - pi: (S,) initial state probabilities
+        - A: (S, S) transition probabilities
+        - E: (S, M) emission probabilities, E[s, o] = P(o | s)
+        - sequences: list of integer observation arrays
+    """
+    observations, lengths, _ = pad_batch([np.asarray(o, dtype=int)
+        for o in sequences])
+    with np.errstate(divide='ignore'):
+        log_B = np.log(E.T[observations])
+        log_pi = np.log(pi)
+    posteriors, loglik, transitions = _forward_backward(log_pi, A, log_B,
+        lengths, transitions=True)
+
+    emissions = np.zeros(E.shape[::-1])
+    mask = np.arange(observations.shape[1]) < lengths[:, np.newaxis]
+    np.add.at(emissions, observations[mask], posteriors[mask])
+    return Statistics(posteriors[:, 0].sum(axis=0), transitions, emissions.T,
+        loglik.sum())
+
+def _statistics_worker(args):
+    return sufficient_statistics(*args)
+
+def _normalize(counts, previous):
+    # rows without any expected counts keep their previous values
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.where(totals > 0, counts / np.where(totals > 0, totals, 1),
+        previous)
+
+def baum_welch(sequences, pi, A, E, num_iterations=100, tol=1e-6,
+        batch_size=1000, processes=None):
+    """
+    Description:
+        - Re-estimate an HMM with discrete emissions from observation
+            sequences by expectation maximization. Each iteration computes the
+            expected sufficient statistics of batches of sequences (in
+            processes workers if given), sums them, and renormalizes.
+
+    Args:
+        - sequences: list of integer observation arrays
+        - pi, A, E: initial parameters (see sufficient_statistics)
+        - num_iterations: maximum number of iterations
+        - tol: stop once the log likelihood improves by less than this
+        - batch_size: sequences per task
+        - processes: if given, number of worker processes
+
+    Returns:
+        - pi, A, E: the re-estimated parameters
+        - logliks: log likelihood of the sequences before each update
+    """
+    pi, A, E = (np.asarray(x, dtype=float) for x in (pi, A, E))
+    batches = [sequences[i:i + batch_size]
+        for i in range(0, len(sequences), batch_size)]
+    pool = multiprocessing.Pool(processes) if processes is not None else None
+    logliks = []
+    try:
+        for _ in range(num_iterations):
+            tasks = [(pi, A, E, batch) for batch in batches]
+            if pool is None:
+                results = [_statistics_worker(task) for task in tasks]
+            else:
+                results = pool.map(_statistics_worker, tasks)
+            total = Statistics(*(sum(r[i] for r in results)
+                for i in range(len(Statistics._fields))))
+
+            logliks.append(total.loglik)
+            pi = _normalize(total.initial, pi)
+            A = _normalize(total.transitions, A)
+            E = _normalize(total.emissions, E)
+            if len(logliks) > 1 and logliks[-1] - logliks[-2] < tol:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return pi, A, E, logliks
@@ -0,0 +1,240 @@
+
+import networkx as nx
+import numpy as np
+
+from variable_elimination import (Factor, combine, cpd_factor, greedy_order,
+    moral_neighbors)
+
+class JunctionTree(object):
+    """
+    Description:
+        - Clique tree for repeated marginal queries on a BayesianNetwork under
+            slowly changing evidence.
+
+        - Compiled once: the cliques are those formed by a greedy (min-fill or
+            min-weight) elimination of the moral graph, connected by a maximum
+            spanning tree on separator size, and each cpd is multiplied into
+            one clique containing its family. Evidence on a variable is an
+            indicator multiplied into one clique containing it (its home).
+
+        - Messages are computed lazily (Shafer-Shenoy) and cached. The message
+            from clique i to clique j depends only on the potentials on i's
+            side of the edge, so when the evidence on a variable changes only
+            the messages directed away from its home clique are dropped, and a
+            later marginal recomputes just those on the path from the home
+            clique to the clique being read.
+    """
+    def __init__(self, network, heuristic='min_fill'):
+        """
+        Args:
+            - network: BayesianNetwork whose cpds can be converted to tabular
+            - heuristic: elimination heuristic, 'min_fill' or 'min_weight'
+        """
+        cpds = {cpd.variable: cpd for cpd in network.tabular_cpds()}
+        self.cardinalities = {v: cpd.cardinality for (v, cpd) in cpds.items()}
+
+        # cliques from an elimination order, keeping only maximal ones
+        neighbors = moral_neighbors(cpds, list(cpds))
+        _, cliques = greedy_order(neighbors, self.cardinalities, heuristic)
+        cliques.sort(key=len, reverse=True)
+        maximal = []
+        # maximal cliques containing each variable
+        containing = {}
+        for c in cliques:
+            v = next(iter(c))
+            if not any(c <= maximal[i] for i in containing.get(v, [])):
+                for u in c:
+                    containing.setdefault(u, []).append(len(maximal))
+                maximal.append(c)
+        self.cliques = [tuple(sorted(c, key=str)) for c in maximal]
+        self._containing = containing
+
+        # maximum spanning tree on separator size over the cliques that share
+        # a variable, with any remaining components chained together by empty
+        # separators so that there is a single tree
+        graph = nx.Graph()
+        graph.add_nodes_from(range(len(self.cliques)))
+        for members in containing.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    i, j = members[a], members[b]
+                    if not graph.has_edge(i, j):
+                        weight = len(set(self.cliques[i]) & set(self.cliques[j]))
+                        graph.add_edge(i, j, weight=weight)
+        tree = nx.maximum_spanning_tree(graph)
+        roots = [min(c) for c in nx.connected_components(tree)]
+        tree.add_edges_from(zip(roots, roots[1:]))
+        self.neighbors = {i: sorted(tree.neighbors(i)) for i in tree.nodes()}
+        self.separators = {}
+        for (i, j) in tree.edges():
+            sep = tuple(v for v in self.cliques[i] if v in self.cliques[j])
+            self.separators[(i, j)] = self.separators[(j, i)] = sep
+
+        # each cpd and each variable's evidence goes to the smallest clique
+        # containing it
+        factors = {i: [] for i in range(len(self.cliques))}
+        for cpd in cpds.values():
+            family = set(cpd.parents) | set([cpd.variable])
+            factors[self._smallest_clique(family)].append(cpd_factor(cpd))
+        # start from ones so that every clique variable has an axis
+        self.base_potentials = [combine([self._ones(c)] + factors[i], c)
+            for (i, c) in enumerate(self.cliques)]
+        self.home = {v: self._smallest_clique(set([v])) for v in cpds}
+
+        # root the tree to find which side of an edge a clique is on
+        self._enter, self._exit = {}, {}
+        self._euler_tour()
+
+        self.evidence = {}
+        self.potentials = {}
+        self.messages = {}
+        self.beliefs = {}
+
+    def _ones(self, variables):
+        return Factor(variables,
+            np.ones([self.cardinalities[v] for v in variables]))
+
+    def _smallest_clique(self, variables):
+        v = next(iter(variables))
+        return min((i for i in self._containing[v]
+            if variables <= set(self.cliques[i])),
+            key=lambda i: len(self.cliques[i]))
+
+    def _euler_tour(self):
+        # iterative dfs recording entry and exit times from clique 0
+        time = 0
+        parent = {0: None}
+        stack = [(0, iter(self.neighbors[0]))]
+        self._enter[0] = time
+        while stack:
+            i, children = stack[-1]
+            for j in children:
+                if j not in parent:
+                    parent[j] = i
+                    time += 1
+                    self._enter[j] = time
+                    stack.append((j, iter(self.neighbors[j])))
+                    break
+            else:
+                stack.pop()
+                self._exit[i] = time
+        self.parent = parent
+
+    def _in_subtree(self, i, root):
+        return self._enter[root] <= self._enter[i] <= self._exit[root]
+
+    def _on_sender_side(self, clique, i, j):
+        # whether clique is on i's side of the edge i - j
+        if self.parent.get(i) == j:
+            return self._in_subtree(clique, i)
+        return not self._in_subtree(clique, j)
+
+    def set_evidence(self, evidence):
+        """
+        Description:
+            - Replace the evidence, dropping only the cached messages that
+                depend on variables whose observed value changed.
+
+        Args:
+            - evidence: dict mapping observed variables to their values
+        """
+        changed = set(v for v in self.evidence if v not in evidence)
+        changed.update(v for v in evidence
+            if self.evidence.get(v) != evidence[v])
+        self.evidence = dict(evidence)
+        for v in changed:
+            self._invalidate(self.home[v])
+
+    def observe(self, variable, value):
+        evidence = dict(self.evidence)
+        evidence[variable] = value
+        self.set_evidence(evidence)
+
+    def unobserve(self, variable):
+        evidence = dict(self.evidence)
+        evidence.pop(variable, None)
+        self.set_evidence(evidence)
+
+    def _invalidate(self, clique):
+        self.potentials.pop(clique, None)
+        self.beliefs = {}
+        for key in list(self.messages):
+            if self._on_sender_side(clique, *key):
+                del self.messages[key]
+
+    def _potential(self, i):
+        if i not in self.potentials:
+            potential = self.base_potentials[i]
+            table = potential.table
+            for (axis, v) in enumerate(potential.variables):
+                if v in self.evidence and self.home[v] == i:
+                    indicator = np.zeros(self.cardinalities[v])
+                    indicator[self.evidence[v]] = 1.
+                    shape = [1] * table.ndim
+                    shape[axis] = -1
+                    table = table * indicator.reshape(shape)
+            self.potentials[i] = Factor(potential.variables, table)
+        return self.potentials[i]
+
+    def _message(self, i, j):
+        # compute (i, j) after any missing messages it depends on, without
+        # recursion since the tree may be deep
+        stack = [(i, j)]
+        while stack:
+            a, b = stack[-1]
+            if (a, b) in self.messages:
+                stack.pop()
+                continue
+            missing = [(k, a) for k in self.neighbors[a]
+                if k != b and (k, a) not in self.messages]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            incoming = [self.messages[(k, a)] for k in self.neighbors[a]
+                if k != b]
+            message = combine([self._potential(a)] + incoming,
+                self.separators[(a, b)])
+            # normalize to avoid underflow on long paths
+            total = message.table.sum()
+            if total > 0:
+                message = Factor(message.variables, message.table / total)
+            self.messages[(a, b)] = message
+        return self.messages[(i, j)]
+
+    def belief(self, i):
+        """
+        Description:
+            - Return the calibrated belief (unnormalized) of clique i.
+        """
+        if i not in self.beliefs:
+            incoming = [self._message(k, i) for k in self.neighbors[i]]
+            self.beliefs[i] = combine([self._potential(i)] + incoming,
+                self.cliques[i])
+        return self.beliefs[i]
+
+    def calibrate(self):
+        """
+        Description:
+            - Compute every missing message so that all marginals can be read.
+        """
+        for i in self.neighbors:
+            for j in self.neighbors[i]:
+                self._message(i, j)
+
+    def marginal(self, variable):
+        """
+        Description:
+            - Return P(variable | evidence) as a vector.
+        """
+        i = self.home[variable]
+        table = combine([self.belief(i)], (variable,)).table
+        return table / table.sum()
+
+    def marginals(self):
+        """
+        Description:
+            - Return a dict mapping every variable to P(variable | evidence).
+        """
+        self.calibrate()
+        return {v: self.marginal(v) for v in self.home}
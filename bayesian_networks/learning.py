@@ -0,0 +1,180 @@
+
+import csv
+import functools
+import multiprocessing
+
+import networkx as nx
+import numpy as np
+
+from cpds import TabularCPD
+
+"""
+Maximum likelihood learning of discrete cpds for a known structure from data
+streamed in chunks, so the dataset never needs to fit in memory.
+"""
+
+class FamilyCounts(object):
+    """
+    Description:
+        - Sufficient statistics for maximum likelihood estimation of a discrete
+            network's cpds: one count table per family (a variable and its
+            parents), of shape (parent cardinalities..., cardinality).
+
+        - Counts from different chunks or shards merge by addition, which is
+            associative, so a dataset can be counted piece by piece (or in
+            parallel) and reduced without ever holding it in memory.
+    """
+    def __init__(self, graph, cardinalities):
+        """
+        Args:
+            - graph: networkx DiGraph over the variables
+            - cardinalities: dict mapping each variable to its number of values
+        """
+        self.order = list(nx.topological_sort(graph))
+        self.parents = {v: list(graph.predecessors(v)) for v in self.order}
+        self.cardinalities = dict(cardinalities)
+        self.tables = {v: np.zeros([cardinalities[p] for p in self.parents[v]]
+            + [cardinalities[v]], dtype=np.int64) for v in self.order}
+
+    def update(self, columns):
+        """
+        Description:
+            - Add the counts of a chunk of rows. Each family's columns are
+                flattened into one index so a single np.bincount counts them.
+
+        Args:
+            - columns: dict (or structured array) mapping each variable to an
+                integer array of its values in the chunk
+        """
+        for v in self.order:
+            table = self.tables[v]
+            family = [np.asarray(columns[p]) for p in self.parents[v]]
+            family.append(np.asarray(columns[v]))
+            index = np.ravel_multi_index(family, table.shape)
+            table += np.bincount(index, minlength=table.size).reshape(
+                table.shape)
+        return self
+
+    def __add__(self, other):
+        total = FamilyCounts.__new__(FamilyCounts)
+        total.order = self.order
+        total.parents = self.parents
+        total.cardinalities = self.cardinalities
+        total.tables = {v: self.tables[v] + other.tables[v] for v in self.order}
+        return total
+
+    def to_cpds(self, alpha=0.):
+        """
+        Description:
+            - Return a TabularCPD per variable in topological order with the
+                maximum likelihood (alpha = 0) or, with a symmetric Dirichlet
+                prior of concentration alpha, the posterior mean estimates.
+                Parental instantiations with no data get a uniform
+                distribution.
+        """
+        cpds = []
+        for v in self.order:
+            table = self.tables[v] + float(alpha)
+            totals = table.sum(axis=-1, keepdims=True)
+            table = np.where(totals > 0, table / np.where(totals > 0, totals, 1),
+                1. / table.shape[-1])
+            cpds.append(TabularCPD(v, self.parents[v], table))
+        return cpds
+
+"""
+Data sources: each yields chunks as dicts (or structured arrays) of columns.
+"""
+
+def iter_csv_chunks(path, chunk_size=100000, delimiter=','):
+    """
+    Description:
+        - Yield chunks of at most chunk_size rows of a csv file whose header
+            names the variables and whose values are integers.
+    """
+    with open(path) as infile:
+        reader = csv.reader(infile, delimiter=delimiter)
+        header = next(reader)
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _csv_columns(header, rows)
+                rows = []
+        if rows:
+            yield _csv_columns(header, rows)
+
+def _csv_columns(header, rows):
+    values = np.array(rows, dtype=np.int64)
+    return {name: values[:, i] for (i, name) in enumerate(header)}
+
+def iter_array_chunks(data, chunk_size=100000):
+    """
+    Description:
+        - Yield chunks of at most chunk_size rows of a structured array, or of
+            a .npy file holding one, which is memory mapped rather than read.
+    """
+    if isinstance(data, str):
+        data = np.load(data, mmap_mode='r')
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def iter_chunks(source, chunk_size=100000):
+    """
+    Description:
+        - Yield chunks from a csv path, a .npy path, a structured array, or an
+            iterator that already yields chunks.
+    """
+    if isinstance(source, str) and source.endswith('.csv'):
+        return iter_csv_chunks(source, chunk_size)
+    if isinstance(source, (str, np.ndarray)):
+        return iter_array_chunks(source, chunk_size)
+    return iter(source)
+
+def count(graph, cardinalities, source, chunk_size=100000):
+    """
+    Description:
+        - Return the FamilyCounts of a data source (see iter_chunks), streamed
+            chunk_size rows at a time.
+    """
+    counts = FamilyCounts(graph, cardinalities)
+    for chunk in iter_chunks(source, chunk_size):
+        counts.update(chunk)
+    return counts
+
+def _count_shard(source, graph, cardinalities, chunk_size):
+    return count(graph, cardinalities, source, chunk_size)
+
+def count_shards(graph, cardinalities, sources, chunk_size=100000,
+        processes=None):
+    """
+    Description:
+        - Return the FamilyCounts of several data sources (e.g., shard files),
+            counting each in its own worker process when processes is given
+            and reducing the results by addition.
+    """
+    worker = functools.partial(_count_shard, graph=graph,
+        cardinalities=cardinalities, chunk_size=chunk_size)
+    if processes is None:
+        shards = map(worker, sources)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            shards = pool.map(worker, sources)
+        finally:
+            pool.close()
+            pool.join()
+    return functools.reduce(lambda a, b: a + b, shards)
+
+def learn_cpds(graph, cardinalities, sources, alpha=0., chunk_size=100000,
+        processes=None):
+    """
+    Description:
+        - Return TabularCPDs, in topological order, estimated from one data
+            source or a list of shards (see count_shards), with optional
+            Dirichlet smoothing alpha. Pass them with the graph to
+            BayesianNetwork.
+    """
+    if not isinstance(sources, list):
+        sources = [sources]
+    counts = count_shards(graph, cardinalities, sources, chunk_size, processes)
+    return counts.to_cpds(alpha)
@@ -1,32 +1,422 @@
 
 import numpy as np
 
+"""
+Viterbi decoding in log space. Each time step is one broadcast max / argmax
+over the (S, S) transition matrix for every sequence in a batch at once, so
+the only Python loop is over time.
+"""
+
+def _log(x):
+    with np.errstate(divide='ignore'):
+        return np.log(np.asarray(x, dtype=float))
+
+def _pointer_dtype(num_states):
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_states <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+class DenseTransitions(object):
+    """
+    Description:
+        - (S, S) log transition matrix. A step takes a broadcast max / argmax
+            over the transposed matrix so that the max runs over contiguous
+            memory, restricted to the active (unpruned) previous states if
+            given.
+    """
+    def __init__(self, log_A):
+        self.log_A_T = np.ascontiguousarray(np.asarray(log_A, dtype=float).T)
+        self.num_states = len(self.log_A_T)
+        self._buf = None
+
+    def step(self, delta, active=None):
+        """
+        Description:
+            - Return, for each sequence in the batch and each state, the best
+                score of reaching that state from delta (shape (N, S)) and the
+                previous state achieving it.
+        """
+        log_A_T = self.log_A_T
+        if active is not None:
+            log_A_T, delta = log_A_T[:, active], delta[:, active]
+            out = None
+        else:
+            # reuse the (N, S, S) buffer across steps
+            shape = (len(delta),) + log_A_T.shape
+            if self._buf is None or self._buf.shape != shape:
+                self._buf = np.empty(shape)
+            out = self._buf
+        scores = np.add(delta[:, np.newaxis, :], log_A_T[np.newaxis], out=out)
+        best = scores.argmax(axis=2)
+        rows = np.arange(len(delta))[:, np.newaxis]
+        new = delta[rows, best] + log_A_T[np.arange(self.num_states), best]
+        return new, (active[best] if active is not None else best)
+
+class SparseTransitions(object):
+    """
+    Description:
+        - Sparse log transition matrix: anything with a tocsr method (e.g., a
+            scipy.sparse matrix) whose stored entries are the log
+            probabilities of the possible transitions, missing entries being
+            impossible ones (see sparse_log). A step costs O(N nnz), or only
+            the edges out of the active previous states if given: the
+            candidate scores of the edges, grouped by target state, are
+            reduced with np.maximum.reduceat.
+    """
+    def __init__(self, log_A):
+        csr = log_A.tocsr()
+        self.indptr = np.asarray(csr.indptr)
+        self.indices = np.asarray(csr.indices)
+        self.data = np.asarray(csr.data, dtype=float)
+        self.num_states = csr.shape[0]
+        self._all = self._edges(np.arange(self.num_states))
+
+    def _edges(self, rows):
+        # the edges out of rows sorted by target, then source (see _grouped)
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(counts) - counts
+        positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        src = np.repeat(rows, counts)
+        dst = self.indices[positions]
+        order = np.lexsort((src, dst))
+        return _grouped(src[order], self.data[positions][order], dst[order])
+
+    def step(self, delta, active=None):
+        """
+        Description:
+            - See DenseTransitions.step.
+        """
+        # gathering and sorting the active rows' edges only pays off for a
+        # narrow beam; pruned states have -inf scores anyway
+        if active is None or 8 * len(active) >= self.num_states:
+            src, weights, targets, groups = self._all
+        else:
+            src, weights, targets, groups = self._edges(active)
+        N, S = len(delta), self.num_states
+        new = np.full((N, S), -np.inf)
+        best = np.tile(np.arange(S), (N, 1))
+        if len(src) == 0:
+            return new, best
+        scores = delta[:, src] + weights
+        top = np.maximum.reduceat(scores, groups, axis=1)
+        # first edge (smallest source) achieving each group's max
+        sizes = np.diff(np.append(groups, len(src)))
+        edge = np.where(scores == np.repeat(top, sizes, axis=1),
+            np.arange(len(src)), len(src))
+        new[:, targets] = top
+        best[:, targets] = src[np.minimum.reduceat(edge, groups, axis=1)]
+        return new, best
+
+def _grouped(src, weights, dst):
+    # edges sorted by target with the distinct targets and the offset of each
+    # one's group
+    groups = np.flatnonzero(np.r_[True, dst[1:] != dst[:-1]]) if len(dst) \
+        else np.empty(0, dtype=int)
+    return src, weights, dst[groups], groups
+
+def transitions(log_A):
+    """
+    Description:
+        - Return SparseTransitions for a sparse matrix (duck typed on tocsr, so
+            scipy is not needed here) and DenseTransitions otherwise; already
+            wrapped transitions are returned as is.
+    """
+    if isinstance(log_A, (DenseTransitions, SparseTransitions)):
+        return log_A
+    if hasattr(log_A, 'tocsr'):
+        return SparseTransitions(log_A)
+    return DenseTransitions(log_A)
+
+def sparse_log(A):
+    """
+    Description:
+        - Return a CSR copy of a sparse transition probability matrix with the
+            log of its stored entries, for use as a sparse log_A.
+    """
+    A = A.tocsr().copy()
+    with np.errstate(divide='ignore'):
+        A.data = np.log(A.data)
+    return A
+
+def _prune(delta, beam_width=None, beam_threshold=None):
+    """
+    Description:
+        - Set to -inf the scores of states outside the beam: all but the
+            beam_width best of each sequence, and those more than
+            beam_threshold below the sequence's best.
+    """
+    if beam_width is not None and beam_width < delta.shape[1]:
+        kth = np.partition(delta, -beam_width, axis=1)[:, -beam_width]
+        delta = np.where(delta >= kth[:, np.newaxis], delta, -np.inf)
+    if beam_threshold is not None:
+        top = delta.max(axis=1, keepdims=True)
+        delta = np.where(delta >= top - beam_threshold, delta, -np.inf)
+    return delta
+
+def pad_batch(log_B, lengths=None):
+    """
+    Description:
+        - Return a batch of per step arrays (a (N, T, ...) array, or a list of
+            (T_i, ...) arrays which is padded with zeros) as a (N, T, ...)
+            array, the length of each sequence, and whether it was ragged.
+    """
+    if isinstance(log_B, np.ndarray):
+        if lengths is None:
+            lengths = np.full(log_B.shape[0], log_B.shape[1])
+        return log_B, np.asarray(lengths), False
+    lengths = np.array([len(b) for b in log_B])
+    first = np.asarray(log_B[0])
+    padded = np.zeros((len(log_B), lengths.max(initial=0)) + first.shape[1:],
+        dtype=first.dtype)
+    for (i, b) in enumerate(log_B):
+        padded[i, :len(b)] = b
+    return padded, lengths, True
+
+def _forward(delta, trans, log_B, lengths, start, stop, beam=None,
+        pointers=None):
+    """
+    Description:
+        - Advance the batch scores delta through time steps [start, stop),
+            writing the backpointers of step t to pointers[t - start] if
+            pointers is given, and return the scores at stop - 1. With a beam
+            (beam_width, beam_threshold), the scores are pruned after every
+            step and only the surviving states are expanded.
+    """
+    identity = np.arange(trans.num_states)
+    for t in range(start, stop):
+        expand = None
+        if beam is not None:
+            expand = np.flatnonzero(np.isfinite(delta).any(axis=0))
+        new, best = trans.step(delta, expand)
+        active = (t < lengths)[:, np.newaxis]
+        delta = np.where(active, new + log_B[:, t], delta)
+        if beam is not None:
+            delta = _prune(delta, *beam)
+        if pointers is not None:
+            pointers[t - start] = np.where(active, best, identity)
+    return delta
+
+def viterbi(log_pi, log_A, log_B, lengths=None, checkpoint=False,
+        beam_width=None, beam_threshold=None):
+    """
+    Description:
+        - Return the most likely state sequences of an HMM and their log
+            probabilities. A sequence ends at its length: past it the scores
+            are frozen and the backpointers are the identity, so padded
+            sequences decode alongside longer ones.
+
+        - By default the (T, N, S) backpointers are kept for the backtrack.
+            With checkpoint, the sequence is split into segments of about
+            sqrt(T) steps and only the scores at the start of each segment are
+            kept on the forward pass; the backtrack then recomputes one
+            segment's backpointers at a time, from the last segment to the
+            first. This bounds memory by O(N S sqrt(T)) at the cost of a
+            second forward pass.
+
+    Args:
+        - log_pi: (S,) log initial state probabilities
+        - log_A: (S, S) log transition probabilities, log_A[i, j] = log P(j | i),
+            or a sparse matrix of them (see SparseTransitions)
+        - log_B: emission log likelihoods log P(o_t | s); a (T, S) array for
+            one sequence, a (N, T, S) array for a padded batch, or a list of
+            (T_i, S) arrays for a ragged batch (a memory mapped array works
+            too, and is read one segment at a time with checkpoint)
+        - lengths: length of each sequence of a padded batch (default T)
+        - checkpoint: if True, use O(S sqrt(T)) memory as described above
+        - beam_width: if given, keep only this many best states per sequence
+            after each step (the result is then approximate)
+        - beam_threshold: if given, drop states whose log score is more than
+            this below the best after each step (the result is then
+            approximate)
+
+    Returns:
+        - for one sequence, its log probability and its (T,) path; for a
+            padded batch, (N,) log probabilities and (N, T) paths with -1 past
+            each length; for a ragged batch, (N,) log probabilities and a list
+            of paths
+    """
+    if isinstance(log_B, np.ndarray) and log_B.ndim == 2:
+        scores, paths = viterbi(log_pi, log_A, log_B[np.newaxis],
+            checkpoint=checkpoint, beam_width=beam_width,
+            beam_threshold=beam_threshold)
+        return scores[0], paths[0]
+    log_B, lengths, ragged = pad_batch(log_B, lengths)
+    log_pi = np.asarray(log_pi, dtype=float)
+    trans = transitions(log_A)
+    beam = None
+    if beam_width is not None or beam_threshold is not None:
+        beam = (beam_width, beam_threshold)
+    N, T, S = log_B.shape
+    if T == 0:
+        empty = np.empty((N, 0), dtype=int)
+        return np.zeros(N), list(empty) if ragged else empty
+
+    size = int(np.ceil(np.sqrt(T))) if checkpoint else T
+    starts = list(range(0, T, size))
+
+    # forward pass, keeping the scores entering each segment (at time
+    # start - 1, or time 0 for the first segment whose first step is 1); the
+    # last segment is left for the backtrack, which needs its backpointers
+    # first anyway
+    delta = log_pi + log_B[:, 0]
+    if beam is not None:
+        delta = _prune(delta, *beam)
+    entering = {}
+    for start in starts:
+        entering[start] = delta
+        if start != starts[-1]:
+            delta = _forward(delta, trans, log_B, lengths, max(start, 1),
+                start + size, beam)
+
+    # backtrack all sequences together, a segment at a time from the end
+    paths = np.empty((N, T), dtype=int)
+    rows = np.arange(N)
+    pointers = np.empty((size, N, S), dtype=_pointer_dtype(S))
+    for start in reversed(starts):
+        stop = min(start + size, T)
+        first = max(start, 1)
+        end = _forward(entering[start], trans, log_B, lengths, first, stop,
+            beam, pointers)
+        if stop == T:
+            delta = end
+            paths[:, -1] = delta.argmax(axis=1)
+        for t in range(stop - 1, first - 1, -1):
+            paths[:, t - 1] = pointers[t - first, rows, paths[:, t]]
+
+    scores = delta[rows, paths[:, -1]]
+    if ragged:
+        return scores, [paths[i, :n] for (i, n) in enumerate(lengths)]
+    paths[np.arange(T) >= lengths[:, np.newaxis]] = -1
+    return scores, paths
+
+class OnlineViterbi(object):
+    """
+    Description:
+        - Viterbi decoder for a single unbounded stream of observations. After
+            each observation the backpointers of the surviving paths (those
+            ending in a state with nonzero probability) are traced back until
+            they meet in a single state; every state up to that point is on
+            the most likely path whatever comes next, so it is emitted and its
+            backpointers are dropped. Memory and latency depend on how far
+            back the paths meet rather than on the stream length.
+
+        - If max_delay is given, a state is emitted no later than max_delay
+            steps after its observation: the state on the currently best path
+            is emitted and paths not passing through it are discarded, so the
+            result is then only approximately the most likely path.
+    """
+    def __init__(self, log_pi, log_A, max_delay=None):
+        """
+        Args:
+            - log_pi: (S,) log initial state probabilities
+            - log_A: (S, S) log transition probabilities, dense or sparse
+            - max_delay: optional bound on the number of undecided steps
+        """
+        self.log_pi = np.asarray(log_pi, dtype=float)
+        self.transitions = transitions(log_A)
+        self.max_delay = max_delay
+        self.delta = None
+        # pointers[k] maps states at time emitted + 1 + k to time emitted + k
+        self.pointers = []
+        self.emitted = 0
+        self.time = -1
+
+    @property
+    def log_prob(self):
+        """
+        Description:
+            - Log probability of the best path over the observations so far.
+        """
+        return self.delta.max()
+
+    def push(self, log_b):
+        """
+        Description:
+            - Consume the emission log likelihoods (S,) of the next observation
+                and return the array of states that became decided, in order.
+        """
+        log_b = np.asarray(log_b, dtype=float)
+        if self.delta is None:
+            self.delta = self.log_pi + log_b
+        else:
+            new, best = self.transitions.step(self.delta[np.newaxis])
+            self.delta = new[0] + log_b
+            # no pointer is needed into a time step that was already emitted,
+            # so that len(self.pointers) == self.time - self.emitted
+            if self.emitted <= self.time:
+                self.pointers.append(best[0].astype(_pointer_dtype(len(log_b))))
+        self.time += 1
+
+        # trace the surviving states back until they coalesce
+        states = np.flatnonzero(np.isfinite(self.delta))
+        t = self.time
+        while len(states) > 1 and t > self.emitted:
+            states = np.unique(self.pointers[t - self.emitted - 1][states])
+            t -= 1
+        if len(states) == 1:
+            return self._emit(t, states[0])
+
+        if self.max_delay is not None and \
+                self.time - self.emitted >= self.max_delay:
+            # force the state on the best path, keeping only paths through it
+            t = self.time - self.max_delay
+            ancestors = np.arange(len(self.delta))
+            for k in range(self.time - self.emitted - 1, t - self.emitted - 1,
+                    -1):
+                ancestors = self.pointers[k][ancestors]
+            state = ancestors[self.delta.argmax()]
+            self.delta = np.where(ancestors == state, self.delta, -np.inf)
+            return self._emit(t, state)
+        return np.empty(0, dtype=int)
+
+    def _emit(self, t, state):
+        # emit the states from self.emitted through t, where the path is in
+        # state at time t, and drop their backpointers
+        path = np.empty(t - self.emitted + 1, dtype=int)
+        path[-1] = state
+        for k in range(t - self.emitted - 1, -1, -1):
+            path[k] = self.pointers[k][path[k + 1]]
+        self.pointers = self.pointers[t - self.emitted + 1:]
+        self.emitted = t + 1
+        return path
+
+    def finish(self):
+        """
+        Description:
+            - Return the remaining undecided states of the best path, ending
+                the stream.
+        """
+        if self.time < self.emitted:
+            return np.empty(0, dtype=int)
+        return self._emit(self.time, self.delta.argmax())
+
+def decode_stream(log_pi, log_A, observations, max_delay=None):
+    """
+    Description:
+        - Generator of the most likely states of a stream, in order, given an
+            iterable of (S,) emission log likelihood vectors (see
+            OnlineViterbi).
+    """
+    decoder = OnlineViterbi(log_pi, log_A, max_delay)
+    for log_b in observations:
+        for state in decoder.push(log_b):
+            yield state
+    for state in decoder.finish():
+        yield state
+
 def markov_chain_viterbi(v, A, T):
-    m = len(v)
-    probs = np.empty((m, T))
-    probs[:,0] = v
-    best = np.empty((m, T))
-    best[:, 0] = 0
-
-    # compute for each state at each timestep the maximum probability 
-    # of any sequence having led to that state
-    for t in range(1, T):
-        for s in range(m):
-            best_prev_s, best_prob = 0, 0
-            for prev_s in range(m):
-                cur_prob = probs[prev_s, t - 1] * A[prev_s, s]
-                if cur_prob > best_prob:
-                    best_prob, best_prev_s = cur_prob, prev_s
-            probs[s,t], best[s, t] = best_prob, best_prev_s
-    max_prob = max(probs[:, -1])
-
-    # go backward through the grid to retrieve the most likely sequence
-    max_prob_seq = np.empty(T, dtype=int)
-    max_prob_seq[-1] = np.argmax(probs[:, -1])
-    for t in range(T - 1, 0, -1):
-        max_prob_seq[t - 1] = best[max_prob_seq[t], t]
-
-    return max_prob, max_prob_seq
+    """
+    Description:
+        - Return the most likely length T state sequence of a markov chain with
+            initial distribution v and transition matrix A (dense or sparse, no
+            emissions), and its probability.
+    """
+    v = np.asarray(v, dtype=float)
+    log_A = sparse_log(A) if hasattr(A, 'tocsr') else _log(A)
+    log_prob, seq = viterbi(_log(v), log_A, np.zeros((T, len(v))))
+    return np.exp(log_prob), seq
 
 if __name__ == '__main__':
     v = np.asarray([1/3., 1/3., 1/3.])
@@ -35,6 +425,14 @@ if __name__ == '__main__':
     prob, seq = markov_chain_viterbi(v, A, T)
     print('seq: {}\nprob: {}'.format(seq, prob))
 
+    # the online decoder agrees with viterbi, also when an observation pins
+    # the state and so emits everything up to it at once
+    log_B = _log(np.asarray([[.6, .3, .1], [0, 1, 0], [.2, .5, .3],
+        [.1, .1, .8], [0, 0, 1], [.4, .4, .2], [.3, .3, .4]]))
+    _, expected = viterbi(_log(v), _log(A), log_B)
+    online = list(decode_stream(_log(v), _log(A), log_B))
+    assert list(expected) == online, (expected, online)
+
 """
 notes:
 1. what's the difference between the forward algorithm and the viterbi algorithm?
@@ -69,4 +467,5 @@ notes:
         - T timesteps, each time computing for each state s of S a max over S states so O(TS^2)
     b. space:
         - requires O(T*S) grid
+        - checkpointing the scores every sqrt(T) steps and recomputing each segment's backpointers during the backtrack brings this to O(S*sqrt(T)) for twice the time
 """
\ No newline at end of file
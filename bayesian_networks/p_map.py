@@ -2,7 +2,9 @@
 
 import collections
 import copy
+import functools
 import itertools
+import multiprocessing
 
 def get_key(variables, i, j):
     return tuple(sorted((variables[i], variables[j])))
@@ -16,14 +18,61 @@ def get_witnesses(variables, i, j):
         for combination in itertools.combinations(temp, r=length):
             yield set(combination)
 
-def are_independent(variables, i, j, witness, indps):
-    key = get_key(variables, i, j)
-    for indp in indps[key]:
-        if len(witness.symmetric_difference(indp)) == 0:
-            return True
-    return False
+class IndependenceSet(object):
+    """
+    Description:
+        - Independencies in the indps format (dict mapping a pair of variables
+            to a list of witness sets, with '.' for the empty set) hashed by
+            frozensets so that each lookup is O(1).
+    """
+    def __init__(self, indps):
+        self.independencies = set()
+        for (pair, witnesses) in indps.items():
+            for witness in witnesses:
+                self.independencies.add((frozenset(pair),
+                    frozenset(witness) - frozenset(['.'])))
+
+    def independent(self, x, y, given=()):
+        return (frozenset([x, y]), frozenset(given)) in self.independencies
+
+def _oracle(indps):
+    # anything with an independent(x, y, given) method, e.g., a data driven
+    # test, is used as is
+    if hasattr(indps, 'independent'):
+        return indps
+    return IndependenceSet(indps)
+
+def _witness(given):
+    return tuple(sorted(given)) if given else ('.',)
+
+def build_skeleton(variables, indps, pc=False, processes=None):
+    """
+    Description:
+        - Return the skeleton (dict mapping each variable to its neighbors) and
+            the witnesses (dict mapping each separated pair to the witness
+            sets found for it, '.' standing for the empty set).
+
+        - By default every witness set of every pair is tested and all
+            separating ones are recorded. With pc, the PC algorithm is used:
+            conditioning sets grow in size one level at a time, are drawn only
+            from the current neighbors of either variable, and a pair is
+            separated by the first one found. Neighbors are taken as of the
+            start of each level, so the edge tests of a level are independent
+            and run in processes workers if given.
+
+    Args:
+        - variables: list of variable names
+        - indps: independencies in the format run_p_map uses, or any object
+            with an independent(x, y, given) method (and optionally a
+            prefetch(subsets) method called with the variable sets of all of a
+            level's candidate tests, see ci_tests.CITest)
+        - pc: whether to use the PC algorithm
+        - processes: with pc, optional number of worker processes
+    """
+    oracle = _oracle(indps)
+    if pc:
+        return _pc_skeleton(variables, oracle, processes)
 
-def build_skeleton(variables, indps):
     # build fully connected undirected graph
     num_vars = len(variables)
     adj = collections.defaultdict(set)
@@ -37,13 +86,15 @@ def build_skeleton(variables, indps):
 
     # for each pair of variables, determine if they can be separated
     for i in range(num_vars):
-        for j in range(num_vars):
-            if i == j: continue
-
+        for j in range(i + 1, num_vars):
             # go through every possible witness
             # if that witness separates the variables, then remove the edge
             for witness in get_witnesses(variables, i, j):
-                if are_independent(variables, i, j, witness, indps):
+                # '.' only stands for the empty set on its own
+                if '.' in witness and len(witness) > 1:
+                    continue
+                given = witness - set(['.'])
+                if oracle.independent(variables[i], variables[j], given):
                     adj[variables[i]].discard(variables[j])
                     adj[variables[j]].discard(variables[i])
                     key = get_key(variables, i, j)
@@ -52,6 +103,61 @@ def build_skeleton(variables, indps):
     # return the skeleton and witnesses
     return adj, witnesses
 
+def _separate(oracle, edge):
+    # first conditioning set of the level's size drawn from either
+    # variable's neighbors that separates the edge, or None
+    x, y, neighbors_x, neighbors_y, size = edge
+    tried = set()
+    for neighbors in (neighbors_x, neighbors_y):
+        for given in itertools.combinations(neighbors, size):
+            key = frozenset(given)
+            if key in tried:
+                continue
+            tried.add(key)
+            if oracle.independent(x, y, given):
+                return given
+    return None
+
+def _pc_skeleton(variables, oracle, processes=None):
+    adj = collections.defaultdict(set)
+    for x in variables:
+        adj[x].update(y for y in variables if y != x)
+    witnesses = collections.defaultdict(set)
+
+    pool = multiprocessing.Pool(processes) if processes is not None else None
+    separate = functools.partial(_separate, oracle)
+    try:
+        size = 0
+        while any(len(adj[x]) - 1 >= size for x in variables):
+            # neighbors as of the start of the level
+            edges = [(x, y, sorted(adj[x] - set([y])),
+                sorted(adj[y] - set([x])), size)
+                for x in variables for y in sorted(adj[x])
+                if x < y and max(len(adj[x]), len(adj[y])) - 1 >= size]
+            if hasattr(oracle, 'prefetch'):
+                # let the oracle gather what every candidate test needs at
+                # once (e.g., one pass over the data for all count tables)
+                oracle.prefetch(set(frozenset((x, y) + given)
+                    for (x, y, neighbors_x, neighbors_y, _) in edges
+                    for neighbors in (neighbors_x, neighbors_y)
+                    for given in itertools.combinations(neighbors, size)))
+            if pool is None:
+                results = [separate(edge) for edge in edges]
+            else:
+                results = pool.map(separate, edges)
+            for (edge, given) in zip(edges, results):
+                if given is not None:
+                    x, y = edge[:2]
+                    adj[x].discard(y)
+                    adj[y].discard(x)
+                    witnesses[(x, y)].add(_witness(given))
+            size += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return adj, witnesses
+
 def find_potential_immoralities(skeleton):
     # finds all of the X-Z-Y triples s.t. exists edge X-Z-Y, but not X-Y
     potential_immoralities = set()
@@ -79,8 +185,8 @@ def find_true_immoralities(potential_immoralities, witnesses):
             immoralities.add((x,z,y))
     return immoralities
 
-def run_p_map():
-    
+def run_p_map(pc=False):
+
     variables = ['A', 'B', 'C', 'D']
     indps = collections.defaultdict(list)
     # add independencies
@@ -88,7 +194,7 @@ def run_p_map():
     indps[('A','D')] += [set(v) for v in ['.', 'B', ['B','C']]]
     indps[('B','D')] += [set(v) for v in ['.', 'A']]
 
-    skeleton, witnesses = build_skeleton(variables, indps)
+    skeleton, witnesses = build_skeleton(variables, indps, pc=pc)
     print('skeleton: {}'.format(skeleton))
     print('witnesses: {}'.format(witnesses))
 
@@ -98,4 +204,5 @@ def run_p_map():
     print('true immoralities: {}'.format(true_immoralities))
 
 if __name__ == '__main__':
-    run_p_map()
\ No newline at end of file
+    run_p_map()
+    run_p_map(pc=True)
\ No newline at end of file
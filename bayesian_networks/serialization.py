@@ -0,0 +1,96 @@
+
+import collections.abc
+import json
+import os
+
+import networkx as nx
+import numpy as np
+
+import bayesian_network
+from cpds import TabularCPD
+
+"""
+Compact on disk format for BayesianNetworks: a directory holding index.json,
+with the structure and the name, parents, shape and offset of each cpd, and
+tables.npy, with every cpd table flattened into one contiguous float64 array.
+Loading memory maps tables.npy, so worker processes loading the same network
+share its pages, and each TabularCPD is only created (as a view into the map)
+when first accessed. Variable names must be strings or numbers.
+"""
+
+INDEX = 'index.json'
+TABLES = 'tables.npy'
+
+def save(network, path):
+    """
+    Description:
+        - Write a BayesianNetwork (whose cpds can be converted to tabular) to
+            the directory path, creating it if needed.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    tabular = network.tabular_cpds()
+    entries, offset = [], 0
+    for cpd in tabular:
+        entries.append({'variable': cpd.variable, 'parents': cpd.parents,
+            'shape': list(cpd.table.shape), 'offset': offset})
+        offset += cpd.table.size
+
+    # write the tables straight into the file rather than concatenating them
+    tables = np.lib.format.open_memmap(os.path.join(path, TABLES), mode='w+',
+        dtype=np.float64, shape=(offset,))
+    for (entry, cpd) in zip(entries, tabular):
+        tables[entry['offset']:entry['offset'] + cpd.table.size] = \
+            cpd.table.ravel()
+    tables.flush()
+    del tables
+
+    index = {'nodes': list(network.graph.nodes()),
+        'edges': [list(e) for e in network.graph.edges()], 'cpds': entries}
+    with open(os.path.join(path, INDEX), 'w') as outfile:
+        json.dump(index, outfile)
+
+class LazyCPDs(collections.abc.Sequence):
+    """
+    Description:
+        - Read only list of the TabularCPDs of a saved network, each created on
+            first access as a view into the memory mapped tables.
+    """
+    def __init__(self, entries, tables):
+        self.entries = entries
+        self.tables = tables
+        self._cpds = [None] * len(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if self._cpds[i] is None:
+            entry = self.entries[i]
+            size = int(np.prod(entry['shape']))
+            table = self.tables[entry['offset']:entry['offset'] + size]
+            self._cpds[i] = TabularCPD(entry['variable'], entry['parents'],
+                table.reshape(entry['shape']))
+        return self._cpds[i]
+
+def load(path, mmap=True):
+    """
+    Description:
+        - Return the BayesianNetwork saved in the directory path, with its
+            cpds created lazily (see LazyCPDs).
+
+    Args:
+        - path: directory written by save
+        - mmap: whether to memory map the tables rather than read them
+    """
+    with open(os.path.join(path, INDEX)) as infile:
+        index = json.load(infile)
+    tables = np.load(os.path.join(path, TABLES),
+        mmap_mode='r' if mmap else None)
+    graph = nx.DiGraph()
+    graph.add_nodes_from(index['nodes'])
+    graph.add_edges_from(index['edges'])
+    return bayesian_network.BayesianNetwork(graph,
+        LazyCPDs(index['cpds'], tables))
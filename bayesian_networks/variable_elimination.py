@@ -0,0 +1,209 @@
+
+import collections
+import heapq
+
+import networkx as nx
+import numpy as np
+
+"""
+Factors over discrete variables: variables is a tuple of names and table an
+ndarray with one axis per variable, in that order.
+"""
+
+Factor = collections.namedtuple('Factor', ['variables', 'table'])
+
+def cpd_factor(cpd):
+    return Factor(tuple(cpd.parents) + (cpd.variable,), cpd.table)
+
+def reduce_factor(factor, evidence):
+    """
+    Description:
+        - Return the factor restricted to the evidence (dict mapping variables
+            to observed values), dropping the observed variables.
+    """
+    if not any(v in evidence for v in factor.variables):
+        return factor
+    key = tuple(evidence[v] if v in evidence else slice(None)
+        for v in factor.variables)
+    return Factor(tuple(v for v in factor.variables if v not in evidence),
+        factor.table[key])
+
+def combine(factors, keep):
+    """
+    Description:
+        - Return the product of factors with every variable not in keep summed
+            out, as a factor over keep (in that order). Done with one einsum so
+            the full product is never materialized beyond what einsum needs.
+    """
+    axes = {}
+    operands = []
+    for f in factors:
+        operands.append(f.table)
+        operands.append([axes.setdefault(v, len(axes)) for v in f.variables])
+    keep = tuple(keep)
+    operands.append([axes[v] for v in keep])
+    return Factor(keep, np.einsum(*operands))
+
+class VariableElimination(object):
+    """
+    Description:
+        - Exact inference by variable elimination over a BayesianNetwork's
+            tabular cpds. For a query P(variables | evidence):
+            1. only the query and evidence variables and their ancestors in the
+                network's graph are kept (the rest sum to one)
+            2. each cpd becomes a factor restricted to the evidence
+            3. the remaining hidden variables are summed out one at a time in
+                an order chosen greedily by the min-fill (fewest edges added to
+                the interaction graph) or min-weight (smallest product of
+                neighbor cardinalities) heuristic
+
+        - Cost is exponential only in the size of the largest factor created,
+            so networks with low treewidth are answered quickly. Orderings are
+            cached per query shape (the sets of query and evidence variables).
+    """
+    def __init__(self, network, heuristic='min_fill'):
+        """
+        Args:
+            - network: BayesianNetwork whose cpds can be converted to tabular
+            - heuristic: 'min_fill' or 'min_weight'
+        """
+        if heuristic not in ('min_fill', 'min_weight'):
+            raise ValueError("unknown heuristic {}".format(heuristic))
+        self.network = network
+        self.heuristic = heuristic
+        self.cpds = {cpd.variable: cpd for cpd in network.tabular_cpds()}
+        self.cardinalities = {v: cpd.cardinality
+            for (v, cpd) in self.cpds.items()}
+        self.orders = {}
+
+    def query(self, variables, evidence=None):
+        """
+        Description:
+            - Return P(variables | evidence) as an array with one axis per
+                query variable, in the given order.
+
+        Args:
+            - variables: list of query variables
+            - evidence: dict mapping observed variables to their values
+        """
+        evidence = evidence or {}
+        variables = tuple(variables)
+        if any(v in evidence for v in variables):
+            raise ValueError("query variables cannot also be evidence")
+
+        relevant, order = self.elimination_order(variables, evidence.keys())
+        factors = [reduce_factor(cpd_factor(self.cpds[v]), evidence)
+            for v in relevant]
+        for var in order:
+            involved = [f for f in factors if var in f.variables]
+            factors = [f for f in factors if var not in f.variables]
+            scope = []
+            for f in involved:
+                scope.extend(v for v in f.variables
+                    if v != var and v not in scope)
+            factors.append(combine(involved, scope))
+
+        joint = combine(factors, variables).table
+        return joint / joint.sum()
+
+    def elimination_order(self, variables, evidence_variables):
+        """
+        Description:
+            - Return the relevant variables for a query shape and the order in
+                which to eliminate its hidden variables, computing them on the
+                first query of that shape.
+        """
+        key = (frozenset(variables), frozenset(evidence_variables))
+        if key not in self.orders:
+            self.orders[key] = self._elimination_order(*key)
+        return self.orders[key]
+
+    def _elimination_order(self, variables, evidence_variables):
+        graph = self.network.graph
+        relevant = set(variables) | set(evidence_variables)
+        for v in list(relevant):
+            relevant |= nx.ancestors(graph, v)
+
+        neighbors = moral_neighbors(self.cpds, relevant, evidence_variables)
+        hidden = set(neighbors) - set(variables)
+        order, _ = greedy_order(neighbors, self.cardinalities, self.heuristic,
+            hidden)
+        return list(relevant), order
+
+def moral_neighbors(cpds, variables, evidence_variables=()):
+    """
+    Description:
+        - Return a dict mapping each of variables not in evidence_variables to
+            its neighbors in the moral graph restricted to those variables,
+            i.e., the interaction graph of the cpd factors reduced on the
+            evidence.
+
+    Args:
+        - cpds: dict mapping each variable to its cpd
+        - variables: the variables whose families to include
+        - evidence_variables: variables to leave out
+    """
+    neighbors = {v: set() for v in variables if v not in evidence_variables}
+    for v in variables:
+        family = [u for u in cpds[v].parents + [v]
+            if u not in evidence_variables]
+        for u in family:
+            neighbors[u].update(w for w in family if w != u)
+    return neighbors
+
+def greedy_order(neighbors, cardinalities, heuristic='min_fill', hidden=None):
+    """
+    Description:
+        - Greedily choose an elimination order for the variables in hidden
+            (default all), each step eliminating the variable with the lowest
+            min-fill (edges added between its neighbors) or min-weight
+            (product of its neighbors' cardinalities) score and connecting its
+            neighbors. neighbors is modified in place.
+
+    Returns:
+        - order: list of variables in elimination order
+        - cliques: list with the set formed by each variable and its neighbors
+            when it was eliminated
+    """
+    if hidden is None:
+        hidden = set(neighbors)
+    hidden = set(hidden)
+
+    # scores only change near an eliminated variable, so keep them in a heap
+    # with lazily skipped stale entries rather than rescoring every step
+    scores = {}
+    heap = []
+    def rescore(v):
+        scores[v] = _score(v, neighbors, cardinalities, heuristic)
+        heapq.heappush(heap, (scores[v], str(v), v))
+    for v in hidden:
+        rescore(v)
+
+    order, cliques = [], []
+    while hidden:
+        score, _, var = heapq.heappop(heap)
+        if var not in hidden or score != scores[var]:
+            continue
+        order.append(var)
+        hidden.discard(var)
+        adjacent = neighbors.pop(var)
+        cliques.append(adjacent | set([var]))
+        for u in adjacent:
+            neighbors[u].discard(var)
+            neighbors[u].update(w for w in adjacent if w != u)
+        affected = set(adjacent)
+        if heuristic == 'min_fill':
+            for u in adjacent:
+                affected.update(neighbors[u])
+        for u in affected & hidden:
+            rescore(u)
+    return order, cliques
+
+def _score(var, neighbors, cardinalities, heuristic):
+    adjacent = neighbors[var]
+    if heuristic == 'min_weight':
+        return np.prod([cardinalities[u] for u in adjacent])
+    adjacent = list(adjacent)
+    return sum(1 for i in range(len(adjacent))
+        for j in range(i + 1, len(adjacent))
+        if adjacent[j] not in neighbors[adjacent[i]])
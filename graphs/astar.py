@@ -0,0 +1,62 @@
+
+import math
+
+import ucs
+
+class AStar(ucs.UCS):
+    """
+    A* search. Identical to UCS except that the frontier is ordered by
+    f(s) = g(s) + weight * h(s), where g is the cost so far and h is a
+    heuristic estimate of the remaining cost to a goal.
+
+    - weight == 1 with an admissible heuristic (never overestimates) returns an
+        optimal path; if the heuristic is also consistent
+        (h(s) <= c(s, ns) + h(ns)) no state is expanded more than once.
+    - weight > 1 (weighted A*) returns a path that costs at most weight times
+        the optimal, usually after expanding far fewer states.
+    - a zero heuristic reduces to UCS.
+    """
+    def __init__(self, heuristic, weight=1.):
+        """
+        Args:
+            - heuristic: function that takes a state and returns an estimate of
+                the cost to reach a goal from it
+            - weight: factor applied to the heuristic, >= 1
+        """
+        if weight < 1:
+            raise ValueError("weight must be >= 1, got {}".format(weight))
+        self.h = heuristic
+        self.weight = weight
+
+    def heuristic(self, state):
+        return self.weight * self.h(state)
+
+"""
+Heuristics for states that are coordinate tuples:
+"""
+
+def manhattan_heuristic(goals, scale=1):
+    """
+    Description:
+        - Return a heuristic giving the smallest L1 distance to any of goals,
+            admissible and consistent on 4-connected grids whose step costs are
+            at least scale.
+    """
+    goals = list(goals)
+    def h(state):
+        return scale * min(sum(abs(a - b) for (a, b) in zip(state, g))
+            for g in goals)
+    return h
+
+def euclidean_heuristic(goals, scale=1):
+    """
+    Description:
+        - Return a heuristic giving the smallest straight line distance to any
+            of goals, admissible on road-like graphs whose edge costs are at
+            least scale times the distance between their endpoints.
+    """
+    goals = list(goals)
+    def h(state):
+        return scale * min(math.sqrt(sum((a - b) ** 2 for (a, b) in zip(state, g)))
+            for g in goals)
+    return h
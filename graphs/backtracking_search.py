@@ -1,6 +1,4 @@
 
-import sys
-
 import search_algorithm
 
 class BacktrackingSearch(search_algorithm.SearchAlgorithm):
@@ -12,26 +10,33 @@ class BacktrackingSearch(search_algorithm.SearchAlgorithm):
     runtime is O(|V|^2) because for each vertex you look at all of its children, but you know that you'll only ever have to compute the cost of a node one time. So in the worst case every node is connect to every subsequent node, giving n^2 run time. Edges don't play a role because limiting factor is nodes. The collection of actions at the end takes O(n).
 
     In terms of space you have to track the best costs and pointers to the best next state (or you could check each next node at the end)
+
+    Recursion depth equals the longest path, so long DAGs exceed the recursion limit; use dag_shortest_path.DAGShortestPath for those.
     """
 
     def solve(self, problem):
+        stats = self.stats
+        problem = stats.instrument(problem)
         cache = {}
         ptrs = {}
-        def recurse(s):
-            mincost = sys.maxint
+        def recurse(s, depth):
+            mincost = float('inf')
             bestns = None
-            for (a,ns,c) in problem.succAndCost(s):
+            succs = problem.succ_and_cost(s)
+            # the frontier of a depth first search is the current path
+            stats.expanded(len(succs), depth)
+            for (a,ns,c) in succs:
                 if ns in cache:
                     if mincost > c + cache[ns]:
                         mincost = c + cache[ns]
                         bestns = ns
-                elif problem.isGoal(ns):
+                elif problem.is_goal(ns):
                     cache[ns] = 0
                     if mincost > c:
                         mincost = c
                         bestns = ns
                 else:
-                    val = recurse(ns)
+                    val = recurse(ns, depth + 1)
                     if mincost > val + c:
                         mincost = val + c
                         bestns = ns
@@ -39,12 +44,14 @@ class BacktrackingSearch(search_algorithm.SearchAlgorithm):
             ptrs[s] = bestns
             return mincost
 
-        start_state = problem.startState()
-        recurse(start_state)
+        start_state = problem.start_state()
+        with stats.phase('search'):
+            recurse(start_state, 1)
         self.cost = cache[start_state]
 
-        s = start_state
-        self.actions = [s]
-        while not problem.isGoal(s):
-            s = ptrs[s]
-            self.actions.append(s)
+        with stats.phase('backtrack'):
+            s = start_state
+            self.actions = [s]
+            while not problem.is_goal(s):
+                s = ptrs[s]
+                self.actions.append(s)
@@ -0,0 +1,90 @@
+"""
+Many-query shortest paths over one CSRGraph, sharded across a process pool.
+
+The graph's arrays are copied into shared memory once and every worker maps
+them in its initializer, so tasks only carry a source and its goals rather
+than a pickled copy of the graph. Queries that share a source are answered by
+a single one-to-many Dijkstra run (UCS.solve_all) that stops once all of that
+source's goals are settled.
+"""
+
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import csr_graph
+import ucs
+
+# the graph as seen by a worker process, set by _init_worker
+_graph = None
+_blocks = []
+
+def _to_shared(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def _from_shared(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    _blocks.append(block)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def _init_worker(indptr_spec, indices_spec, weights_spec):
+    global _graph
+    weights = _from_shared(weights_spec) if weights_spec is not None else None
+    _graph = csr_graph.CSRGraph(_from_shared(indptr_spec),
+        _from_shared(indices_spec), weights)
+
+def _solve_source(task):
+    source, goals = task
+    problem = csr_graph.CSRSearchProblem(_graph, source, set())
+    costs, ptrs = ucs.UCS().solve_all(problem, goals)
+    results = []
+    for goal in goals:
+        if goal in costs:
+            results.append((source, goal, costs[goal], ucs.backtrack(ptrs, goal)))
+        else:
+            results.append((source, goal, None, None))
+    return results
+
+def batch_shortest_paths(graph, queries, processes=None):
+    """
+    Description:
+        - Generator of (source, goal, cost, path) tuples, one per query, in the
+            order they complete. cost and path are None if goal is unreachable.
+
+    Args:
+        - graph: CSRGraph
+        - queries: iterable of (source, goal) node id pairs
+        - processes: number of worker processes (default cpu count)
+    """
+    goals_by_source = collections.OrderedDict()
+    for (source, goal) in queries:
+        goals_by_source.setdefault(int(source), []).append(int(goal))
+    tasks = list(goals_by_source.items())
+
+    blocks, specs = [], []
+    for array in (graph.indptr, graph.indices, graph.weights):
+        if array is None:
+            specs.append(None)
+            continue
+        block, spec = _to_shared(np.ascontiguousarray(array))
+        blocks.append(block)
+        specs.append(spec)
+
+    try:
+        pool = multiprocessing.Pool(processes, _init_worker, tuple(specs))
+        try:
+            for results in pool.imap_unordered(_solve_source, tasks):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
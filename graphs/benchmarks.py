@@ -0,0 +1,263 @@
+"""
+Benchmark harness for the search algorithms.
+
+Generates seeded random sparse, grid, DAG and scale-free graphs at the given
+sizes, runs each applicable algorithm on them and records wall time, the
+search_algorithm.RecordingStats counters and peak traced memory. Results are
+written as JSON so runs from different commits can be compared:
+
+    python benchmarks.py --sizes 1000 10000 --output new.json
+    python benchmarks.py --sizes 1000 10000 --compare old.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import astar
+import backtracking_search
+import bfs
+import csr_graph
+import dag_shortest_path
+import search_algorithm
+import ucs
+
+"""
+Graph generators: each returns (graph, start, goals) with graph a CSRGraph.
+"""
+
+def random_sparse_graph(n, seed, avg_degree=4):
+    rng = random.Random(seed)
+    m = n * avg_degree // 2
+    src = [rng.randrange(n) for _ in range(m)]
+    dst = [rng.randrange(n) for _ in range(m)]
+    weights = [rng.uniform(1, 10) for _ in range(m)]
+    graph = csr_graph.CSRGraph.from_edges(src, dst, n, weights, undirected=True)
+    return graph, 0, set([n - 1])
+
+def grid_graph(n, seed, wall_fraction=.2):
+    # roughly n cells in a square 4-connected grid, node id = y * width + x
+    width = max(2, int(n ** .5))
+    rng = random.Random(seed)
+    walls = set(i for i in range(width * width)
+        if rng.random() < wall_fraction)
+    start, goal = 0, width * width - 1
+    walls.discard(start)
+    walls.discard(goal)
+    src, dst = [], []
+    for y in range(width):
+        for x in range(width):
+            i = y * width + x
+            if i in walls:
+                continue
+            if x + 1 < width and i + 1 not in walls:
+                src.append(i)
+                dst.append(i + 1)
+            if y + 1 < width and i + width not in walls:
+                src.append(i)
+                dst.append(i + width)
+    graph = csr_graph.CSRGraph.from_edges(src, dst, width * width,
+        undirected=True)
+    graph.width = width
+    return graph, start, set([goal])
+
+def dag_graph(n, seed, avg_degree=4, max_span=50):
+    # edges only go from lower to higher ids, with a chain so that the last
+    # node is reachable; costs may be negative
+    rng = random.Random(seed)
+    src, dst, weights = [], [], []
+    for i in range(n - 1):
+        src.append(i)
+        dst.append(i + 1)
+        weights.append(rng.uniform(-1, 10))
+        for _ in range(avg_degree - 1):
+            j = rng.randint(i + 1, min(n - 1, i + max_span))
+            src.append(i)
+            dst.append(j)
+            weights.append(rng.uniform(-1, 10))
+    graph = csr_graph.CSRGraph.from_edges(src, dst, n, weights)
+    return graph, 0, set([n - 1])
+
+def scale_free_graph(n, seed, m=2):
+    # barabasi-albert preferential attachment
+    rng = random.Random(seed)
+    src, dst = [], []
+    targets = list(range(m))
+    repeated = []
+    for i in range(m, n):
+        for t in set(targets):
+            src.append(i)
+            dst.append(t)
+        repeated.extend(targets)
+        repeated.extend([i] * m)
+        targets = [rng.choice(repeated) for _ in range(m)]
+    weights = [rng.uniform(1, 10) for _ in src]
+    graph = csr_graph.CSRGraph.from_edges(src, dst, n, weights, undirected=True)
+    return graph, 0, set([n - 1])
+
+GENERATORS = {
+    'random_sparse': random_sparse_graph,
+    'grid': grid_graph,
+    'dag': dag_graph,
+    'scale_free': scale_free_graph,
+}
+
+"""
+Algorithms: each maps a name to (applies(graph_name), run(problem, graph, stats))
+where run reports into stats and returns the cost found.
+"""
+
+def _run_bfs(problem, graph, stats):
+    algorithm = bfs.BreadthFirstSearch()
+    algorithm.stats = stats
+    algorithm.solve(problem)
+    return algorithm.cost
+
+def _run_ucs(problem, graph, stats):
+    algorithm = ucs.UCS()
+    algorithm.stats = stats
+    algorithm.solve(problem)
+    return algorithm.cost
+
+def _run_astar(problem, graph, stats):
+    width = graph.width
+    goals = [(g % width, g // width) for g in problem.goal_states()]
+    h = astar.manhattan_heuristic(goals)
+    algorithm = astar.AStar(lambda s: h((s % width, s // width)))
+    algorithm.stats = stats
+    algorithm.solve(problem)
+    return algorithm.cost
+
+def _run_dag_shortest_path(problem, graph, stats):
+    algorithm = dag_shortest_path.DAGShortestPath()
+    algorithm.stats = stats
+    algorithm.solve(problem)
+    return algorithm.cost
+
+def _run_backtracking(problem, graph, stats):
+    algorithm = backtracking_search.BacktrackingSearch()
+    algorithm.stats = stats
+    algorithm.solve(problem)
+    return algorithm.cost
+
+ALGORITHMS = {
+    'bfs': (lambda name: True, _run_bfs),
+    'ucs': (lambda name: name != 'dag', _run_ucs),
+    'astar': (lambda name: name == 'grid', _run_astar),
+    'dag_shortest_path': (lambda name: name == 'dag', _run_dag_shortest_path),
+    'backtracking': (lambda name: name == 'dag', _run_backtracking),
+}
+
+def run_one(run, graph, start, goals, repeat):
+    """
+    Description:
+        - Return a dict with the best wall time over repeat runs (with the
+            default no-op stats), the search stats from a recorded run, the
+            peak traced memory and the cost found. Stats and memory are
+            measured in separate runs since recording and tracing slow the
+            search.
+    """
+    best = None
+    for _ in range(repeat):
+        problem = csr_graph.CSRSearchProblem(graph, start, goals)
+        t0 = time.perf_counter()
+        cost = run(problem, graph, search_algorithm.SearchStats())
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+
+    stats = search_algorithm.RecordingStats()
+    run(csr_graph.CSRSearchProblem(graph, start, goals), graph, stats)
+
+    tracemalloc.start()
+    run(csr_graph.CSRSearchProblem(graph, start, goals), graph,
+        search_algorithm.SearchStats())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {'seconds': best, 'expanded': stats.nodes_expanded,
+        'peak_bytes': peak, 'cost': cost}
+    result.update(stats.as_dict())
+    return result
+
+def run_benchmarks(sizes, seed=0, graphs=None, algorithms=None, repeat=3):
+    """
+    Description:
+        - Run every applicable algorithm on every generated graph and return
+            the list of result dicts.
+    """
+    results = []
+    for graph_name in graphs or sorted(GENERATORS):
+        for n in sizes:
+            graph, start, goals = GENERATORS[graph_name](n, seed)
+            for name in algorithms or sorted(ALGORITHMS):
+                applies, run = ALGORITHMS[name]
+                if not applies(graph_name):
+                    continue
+                result = {'graph': graph_name, 'size': n, 'algorithm': name,
+                    'seed': seed, 'edges': graph.num_edges}
+                try:
+                    result.update(run_one(run, graph, start, goals, repeat))
+                except RecursionError:
+                    result['error'] = 'recursion limit'
+                results.append(result)
+                print('{graph:>14} {size:>8} {algorithm:>18} {0}'.format(
+                    '{:.4f}s {} expanded {} bytes'.format(result['seconds'],
+                        result['expanded'], result['peak_bytes'])
+                    if 'error' not in result else result['error'], **result))
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Description:
+        - Return a list of (key, old, new) for every result whose time or peak
+            memory grew by more than threshold (a fraction) over baseline.
+    """
+    def key(r):
+        return (r['graph'], r['size'], r['algorithm'], r['seed'])
+    old = {key(r): r for r in baseline}
+    regressions = []
+    for r in results:
+        k = key(r)
+        if k not in old or 'error' in r or 'error' in old[k]:
+            continue
+        for metric in ('seconds', 'peak_bytes', 'expanded'):
+            if r[metric] > (1 + threshold) * old[k][metric]:
+                regressions.append((k + (metric,), old[k][metric], r[metric]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--graphs', nargs='+', choices=sorted(GENERATORS))
+    parser.add_argument('--algorithms', nargs='+', choices=sorted(ALGORITHMS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='path to write json results')
+    parser.add_argument('--compare', help='json results to compare against')
+    parser.add_argument('--threshold', type=float, default=.2,
+        help='fractional increase counted as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.seed, args.graphs,
+        args.algorithms, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump({'python': platform.python_version(),
+                'time': time.time(), 'results': results}, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for (k, old, new) in regressions:
+            print('regression {}: {} -> {}'.format(k, old, new))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,31 +3,138 @@ import collections
 
 import search_algorithm
 
-Vertex = collections.namedtuple('Vertex', ['value', 'parent'])
-
 class BreadthFirstSearch(search_algorithm.SearchAlgorithm):
+    """
+    Breadth first search that ignores edge costs and returns a path with the
+    fewest edges from a start state to a goal state.
+
+    Each state is entered at most once (a closed set of parent pointers is kept)
+    so runtime is O(|V| + |E|) even on cyclic graphs. All of the problem's
+    start states seed the frontier at once, so searching from a set of sources
+    costs a single traversal rather than one per source.
+
+    With bidirectional=True the search alternates between expanding the smaller
+    of a forward frontier (from the starts) and a backward frontier (from the
+    goals, following problem.pred_and_cost) one full level at a time and stops
+    once they meet. On graphs with branching factor b and shortest path length
+    d this expands O(b^(d/2)) rather than O(b^d) states.
+    """
+    def __init__(self, bidirectional=False):
+        self.bidirectional = bidirectional
 
     def solve(self, problem):
-        v = set()
+        """
+        Description:
+            - Return the list of states from a start state to a goal state
+                (inclusive), or an empty list if no goal is reachable. Also sets
+                self.actions to that path and self.cost to its number of edges
+                (both None if no path exists).
+        """
+        problem = self.stats.instrument(problem)
+        if self.bidirectional:
+            path = self._solve_bidirectional(problem)
+        else:
+            path = self._solve_forward(problem)
+        self.actions = path if path else None
+        self.cost = len(path) - 1 if path else None
+        return path
+
+    def _solve_forward(self, problem):
+        stats = self.stats
+        # parents doubles as the closed set
+        parents = {}
         q = collections.deque()
+        for s in problem.start_states():
+            if s not in parents:
+                parents[s] = None
+                q.append(s)
 
-        s = problem.start_state()
-        s = Vertex(s, None)
-        q.appendleft(s)
-        while len(q) > 0:
-            s = q.pop()
-            if problem.is_goal(s.value):
-                # backtrack path
-                parent, path = s.parent, collections.deque()
-                while parent is not None:
-                    path.appendleft(parent.value)
-                    parent = parent.parent
-                return list(path)
-            else:
+        goal = None
+        with stats.phase('search'):
+            while len(q) > 0:
+                s = q.popleft()
+                if problem.is_goal(s):
+                    goal = s
+                    break
                 # ignore cost
-                for n, _ in problem.succ_and_cost(s.value):
-                    n = Vertex(n, s)
-                    q.appendleft(n)
+                succs = problem.succ_and_cost(s)
+                for _, n, _ in succs:
+                    if n not in parents:
+                        parents[n] = s
+                        q.append(n)
+                stats.expanded(len(succs), len(q))
+
         # did not reach goal, return empty list to indicate no path
-        return []
+        if goal is None:
+            return []
+        with stats.phase('backtrack'):
+            return _backtrack(parents, goal)
+
+    def _solve_bidirectional(self, problem):
+        stats = self.stats
+        fwd_parents, fwd_depth, fwd = {}, {}, []
+        for s in problem.start_states():
+            if s in fwd_parents:
+                continue
+            if problem.is_goal(s):
+                return [s]
+            fwd_parents[s], fwd_depth[s] = None, 0
+            fwd.append(s)
+
+        bwd_parents, bwd_depth, bwd = {}, {}, []
+        for g in problem.goal_states():
+            if g not in bwd_parents:
+                bwd_parents[g], bwd_depth[g] = None, 0
+                bwd.append(g)
+
+        meet = None
+        with stats.phase('search'):
+            while fwd and bwd and meet is None:
+                # expand a full level of the smaller frontier so that the best
+                # meeting point found in the level is a shortest path
+                if len(fwd) <= len(bwd):
+                    fwd, meet = _expand_level(fwd, problem.succ_and_cost,
+                        fwd_parents, fwd_depth, bwd_depth, stats)
+                else:
+                    bwd, meet = _expand_level(bwd, problem.pred_and_cost,
+                        bwd_parents, bwd_depth, fwd_depth, stats)
+
+        if meet is None:
+            return []
+        with stats.phase('backtrack'):
+            path = _backtrack(fwd_parents, meet)
+            n = bwd_parents[meet]
+            while n is not None:
+                path.append(n)
+                n = bwd_parents[n]
+            return path
+
+def _expand_level(frontier, successors, parents, depth, other_depth, stats):
+    """
+    Description:
+        - Expand every state in frontier, returning the next frontier and the
+            state at which this side met the other side with the smallest
+            total depth (or None if the sides did not meet).
+    """
+    next_frontier = []
+    meet, best = None, None
+    for s in frontier:
+        succs = successors(s)
+        for _, n, _ in succs:
+            if n not in parents:
+                parents[n] = s
+                depth[n] = depth[s] + 1
+                next_frontier.append(n)
+            if n in other_depth:
+                total = depth[n] + other_depth[n]
+                if best is None or total < best:
+                    meet, best = n, total
+        stats.expanded(len(succs), len(next_frontier))
+    return next_frontier, meet
 
+def _backtrack(parents, s):
+    path = collections.deque()
+    while s is not None:
+        path.appendleft(s)
+        s = parents[s]
+    return list(path)
@@ -0,0 +1,216 @@
+
+import numpy as np
+
+import search_problem
+
+class CSRGraph(object):
+    """
+    Description:
+        - Directed graph stored in compressed sparse row form. The neighbors of
+            node i are indices[indptr[i]:indptr[i + 1]] with edge costs at the
+            same positions in weights. Nodes are the integers 0..n-1; labels
+            optionally maps each node id to an arbitrary hashable label.
+
+        - An edge costs 4 bytes (12 with float64 weights) rather than the ~100
+            bytes of a list entry in a dict of lists, and traversals index
+            arrays rather than hashing labels, so graphs with tens of millions
+            of edges fit in memory. Undirected graphs store each edge in both directions.
+    """
+    def __init__(self, indptr, indices, weights=None, labels=None):
+        """
+        Args:
+            - indptr: int array of length n + 1 of row offsets into indices
+            - indices: int32 array of edge targets, grouped by source
+            - weights: optional float array of edge costs (default 1)
+            - labels: optional sequence mapping node id to label
+        """
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = None if weights is None else np.asarray(weights)
+        self.labels = labels
+        self.ids = (None if labels is None
+            else {label:i for (i, label) in enumerate(labels)})
+
+    @classmethod
+    def from_edges(cls, src, dst, num_nodes, weights=None, labels=None,
+            undirected=False):
+        """
+        Description:
+            - Build a graph from parallel arrays of edge sources and targets
+                (node ids), adding the reverse of each edge if undirected.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+        if undirected:
+            src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+            if weights is not None:
+                weights = np.concatenate((weights, weights))
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=num_nodes)
+        # int32 offsets unless the edge count does not fit
+        dtype = np.int32 if len(src) < np.iinfo(np.int32).max else np.int64
+        indptr = np.zeros(num_nodes + 1, dtype=dtype)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(indptr, dst[order], None if weights is None
+            else weights[order], labels)
+
+    @classmethod
+    def from_adjacency(cls, adj, weighted=False):
+        """
+        Description:
+            - Build a graph from a dict mapping each label to a list of its
+                neighbor labels, e.g., the adj of UndirectedGraphSearchProblem
+                or Graph.edges. If weighted, the lists instead hold
+                (neighbor, cost) tuples.
+        """
+        labels = list(adj.keys())
+        ids = {label:i for (i, label) in enumerate(labels)}
+        src, dst, weights = [], [], []
+        for label, neighbors in adj.items():
+            for n in neighbors:
+                if weighted:
+                    n, cost = n
+                    weights.append(cost)
+                if n not in ids:
+                    ids[n] = len(labels)
+                    labels.append(n)
+                src.append(ids[label])
+                dst.append(ids[n])
+        return cls.from_edges(src, dst, len(labels),
+            weights if weighted else None, labels)
+
+    @property
+    def num_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def node_id(self, label):
+        return label if self.ids is None else self.ids[label]
+
+    def label(self, i):
+        return i if self.labels is None else self.labels[i]
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def edge_weights(self, i):
+        if self.weights is None:
+            return np.ones(self.indptr[i + 1] - self.indptr[i])
+        return self.weights[self.indptr[i]:self.indptr[i + 1]]
+
+    def transpose(self):
+        """
+        Description:
+            - Return the graph with every edge reversed.
+        """
+        src = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        return CSRGraph.from_edges(self.indices, src, self.num_nodes,
+            self.weights, self.labels)
+
+class CSRSearchProblem(search_problem.SearchProblem):
+    """
+    Description:
+        - SearchProblem adapter over a CSRGraph whose states are node ids.
+            Use graph.node_id and graph.label to convert to and from labels.
+    """
+    def __init__(self, graph, start, goals, ignores=set()):
+        self.graph = graph
+        self.start = start
+        self.goals = goals
+        self.ignores = ignores
+    def start_state(self): return self.start
+    def start_states(self):
+        if isinstance(self.start, (set, frozenset)):
+            return list(self.start)
+        return [self.start]
+    def is_goal(self, s): return s in self.goals
+    def goal_states(self): return list(self.goals)
+    def succ_and_cost(self, s):
+        lo, hi = self.graph.indptr[s], self.graph.indptr[s + 1]
+        neighbors = self.graph.indices[lo:hi].tolist()
+        costs = (self.graph.weights[lo:hi].tolist()
+            if self.graph.weights is not None else [1] * len(neighbors))
+        return [(n, n, c) for (n, c) in zip(neighbors, costs)
+            if n not in self.ignores]
+
+def bfs_levels(graph, sources, goals=None, ignores=None):
+    """
+    Description:
+        - Level synchronous breadth first search that expands the whole
+            frontier at once with array operations: the neighbor lists of all
+            frontier nodes are gathered with a single fancy index, filtered to
+            unvisited nodes and deduplicated, so the interpreter runs one
+            iteration per level rather than one per edge.
+
+    Args:
+        - graph: CSRGraph
+        - sources: node ids from which to start
+        - goals: optional node ids; the search stops after the first level
+            that contains one of them
+        - ignores: optional node ids that may not be entered
+
+    Returns:
+        - dist: int32 array with the number of edges from the nearest source
+            to each node, -1 for unreached nodes
+        - parent: int32 array with each node's predecessor on such a path, -1
+            for sources and unreached nodes
+    """
+    n = graph.num_nodes
+    indptr, indices = graph.indptr, graph.indices
+    dist = np.full(n, -1, dtype=np.int32)
+    parent = np.full(n, -1, dtype=np.int32)
+    blocked = np.zeros(n, dtype=bool)
+    if ignores is not None:
+        blocked[np.asarray(list(ignores), dtype=np.int64)] = True
+    goal_mask = None
+    if goals is not None:
+        goal_mask = np.zeros(n, dtype=bool)
+        goal_mask[np.asarray(list(goals), dtype=np.int64)] = True
+
+    frontier = np.unique(np.asarray(list(sources), dtype=np.int64))
+    dist[frontier] = 0
+    level = 0
+    while len(frontier) > 0:
+        if goal_mask is not None and goal_mask[frontier].any():
+            break
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            break
+        # positions of every frontier node's neighbors in indices
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        neighbors = indices[offsets + np.arange(total)]
+        parents = np.repeat(frontier, counts)
+
+        new = (dist[neighbors] == -1) & ~blocked[neighbors]
+        neighbors, first = np.unique(neighbors[new], return_index=True)
+        level += 1
+        dist[neighbors] = level
+        parent[neighbors] = parents[new][first]
+        frontier = neighbors.astype(np.int64)
+    return dist, parent
+
+def bfs_path(graph, sources, goals, ignores=None):
+    """
+    Description:
+        - Return the list of node ids on a fewest-edge path from any source to
+            any goal, or an empty list if there is none.
+    """
+    dist, parent = bfs_levels(graph, sources, goals, ignores)
+    goals = np.asarray(list(goals), dtype=np.int64)
+    reached = goals[dist[goals] >= 0]
+    if len(reached) == 0:
+        return []
+    s = int(reached[np.argmin(dist[reached])])
+    path = [s]
+    while parent[s] != -1:
+        s = int(parent[s])
+        path.append(s)
+    path.reverse()
+    return path
@@ -0,0 +1,105 @@
+
+import search_algorithm
+
+class DAGShortestPath(search_algorithm.SearchAlgorithm):
+    """
+    Shortest paths on a DAG (negative weight edges allowed) without recursion.
+
+    The sub-DAG reachable from the start state is topologically ordered once
+    with an iterative depth first search, and then every edge is relaxed in a
+    single pass over that order. Since every edge into a state is relaxed
+    before the state itself, each state's cost is final when it is reached.
+
+    Runtime is O(|V| + |E|) over the reachable states and space is O(|V| + |E|)
+    since the successor lists gathered while ordering are reused for the
+    relaxation pass (succ_and_cost is called once per state).
+    """
+
+    def solve(self, problem):
+        """
+        Description:
+            - Find the cheapest path from the start state to any goal state,
+                treating goal states as terminal (like BacktrackingSearch).
+                Sets self.actions to the list of states along the path and
+                self.cost to its cost (both None if no goal is reachable).
+        """
+        start = problem.start_state()
+        costs, ptrs = self._relax(problem, start, problem.is_goal)
+
+        goal_state, self.cost = None, None
+        for s, c in costs.items():
+            if problem.is_goal(s) and (self.cost is None or c < self.cost):
+                goal_state, self.cost = s, c
+
+        self.actions = (_backtrack(ptrs, goal_state)
+            if goal_state is not None else None)
+
+    def solve_all(self, problem):
+        """
+        Description:
+            - Single source mode: return a dict mapping every state reachable
+                from the start state to the cost of the cheapest path to it,
+                along with a dict of backpointers (the start maps to None).
+                Goal states are not treated as terminal.
+        """
+        return self._relax(problem, problem.start_state(), lambda s: False)
+
+    def _relax(self, problem, start, is_terminal):
+        stats = self.stats
+        problem = stats.instrument(problem)
+        with stats.phase('order'):
+            order, succs = _topological_order(problem, start, is_terminal,
+                stats)
+        costs = {start: 0}
+        ptrs = {start: None}
+        with stats.phase('relax'):
+            for s in order:
+                cost_to = costs[s]
+                for (a,ns,c) in succs[s]:
+                    total = cost_to + c
+                    if ns not in costs or total < costs[ns]:
+                        costs[ns] = total
+                        ptrs[ns] = s
+        return costs, ptrs
+
+def _topological_order(problem, start, is_terminal, stats):
+    """
+    Description:
+        - Return the states reachable from start in topological order, along
+            with a dict mapping each state to its successors. Raises a
+            ValueError if a cycle is reachable.
+    """
+    def expand(s):
+        return [] if is_terminal(s) else problem.succ_and_cost(s)
+
+    postorder = []
+    succs = {start: expand(start)}
+    stats.expanded(len(succs[start]), 1)
+    # states on the current dfs path, used to detect cycles
+    on_path = set([start])
+    stack = [(start, iter(succs[start]))]
+    while stack:
+        s, children = stack[-1]
+        for (a,ns,c) in children:
+            if ns in on_path:
+                raise ValueError("cycle through state {}".format(ns))
+            if ns not in succs:
+                succs[ns] = expand(ns)
+                stats.expanded(len(succs[ns]), len(stack) + 1)
+                on_path.add(ns)
+                stack.append((ns, iter(succs[ns])))
+                break
+        else:
+            stack.pop()
+            on_path.discard(s)
+            postorder.append(s)
+    postorder.reverse()
+    return postorder, succs
+
+def _backtrack(ptrs, s):
+    path = []
+    while s is not None:
+        path.append(s)
+        s = ptrs[s]
+    path.reverse()
+    return path
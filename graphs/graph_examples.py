@@ -1,6 +1,8 @@
 
+import astar
 import bfs
 import search_problem
+import ucs
 
 def bfs_example():
     adj = {
@@ -26,5 +28,28 @@ def bfs_example():
     path = algorithm.solve(problem)
     print(path)
 
+def astar_example():
+    # 50x50 grid with a wall across most of the middle
+    walls = set((25, y) for y in range(45))
+    start, goal = (0, 0), (49, 0)
+    problem = search_problem.GridSearchProblem(50, 50, start, set([goal]), walls)
+
+    algorithm = ucs.UCS()
+    algorithm.solve(problem)
+    print('ucs cost: {} expanded: {}'.format(
+        algorithm.cost, algorithm.num_expanded))
+
+    algorithm = astar.AStar(astar.manhattan_heuristic([goal]))
+    algorithm.solve(problem)
+    print('astar cost: {} expanded: {}'.format(
+        algorithm.cost, algorithm.num_expanded))
+
+    # bounded suboptimal, cost at most twice the optimal
+    algorithm = astar.AStar(astar.manhattan_heuristic([goal]), weight=2.)
+    algorithm.solve(problem)
+    print('weighted astar cost: {} expanded: {}'.format(
+        algorithm.cost, algorithm.num_expanded))
+
 if __name__ == '__main__':
-    bfs_example()
\ No newline at end of file
+    bfs_example()
+    astar_example()
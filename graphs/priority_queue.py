@@ -15,4 +15,96 @@ class PriorityQueue(object):
     def pop(self):
         if not self.heap:
             raise ValueError("empty heap")
-        return heapq.heappop(self.heap)
\ No newline at end of file
+        return heapq.heappop(self.heap)
+
+class IndexedPriorityQueue(object):
+    """
+    Binary min heap that also tracks the position of each value in the heap,
+    so each value is held at most once and its priority can be lowered in
+    place (decrease_key) rather than pushing a duplicate. Memory is bounded by
+    the number of live values.
+
+    push, pop, decrease_key: O(lg n)
+    contains, priority: O(1)
+
+    Only priorities are compared, so values need only be hashable.
+    """
+
+    def __init__(self):
+        self.priorities = []
+        self.values = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self.index
+
+    def is_empty(self):
+        return len(self.values) == 0
+
+    def contains(self, value):
+        return value in self.index
+
+    def priority(self, value):
+        return self.priorities[self.index[value]]
+
+    def push(self, priority, value):
+        if value in self.index:
+            raise ValueError("{} already in heap".format(value))
+        self.priorities.append(priority)
+        self.values.append(value)
+        self.index[value] = len(self.values) - 1
+        self._sift_up(len(self.values) - 1)
+
+    def pop(self):
+        if not self.values:
+            raise ValueError("empty heap")
+        priority, value = self.priorities[0], self.values[0]
+        last_priority, last_value = self.priorities.pop(), self.values.pop()
+        del self.index[value]
+        if self.values:
+            self.priorities[0], self.values[0] = last_priority, last_value
+            self.index[last_value] = 0
+            self._sift_down(0)
+        return priority, value
+
+    def decrease_key(self, value, priority):
+        i = self.index[value]
+        if priority > self.priorities[i]:
+            raise ValueError("new priority {} greater than current {}".format(
+                priority, self.priorities[i]))
+        self.priorities[i] = priority
+        self._sift_up(i)
+
+    def _sift_up(self, i):
+        priorities, values, index = self.priorities, self.values, self.index
+        priority, value = priorities[i], values[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if priorities[parent] <= priority:
+                break
+            priorities[i], values[i] = priorities[parent], values[parent]
+            index[values[i]] = i
+            i = parent
+        priorities[i], values[i] = priority, value
+        index[value] = i
+
+    def _sift_down(self, i):
+        priorities, values, index = self.priorities, self.values, self.index
+        n = len(values)
+        priority, value = priorities[i], values[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and priorities[child + 1] < priorities[child]:
+                child += 1
+            if priorities[child] >= priority:
+                break
+            priorities[i], values[i] = priorities[child], values[child]
+            index[values[i]] = i
+            i = child
+        priorities[i], values[i] = priority, value
+        index[value] = i
@@ -1,3 +1,109 @@
+
+import time
+
+class SearchStats(object):
+    """
+    Observer that search algorithms report into while solving. Every method
+    here does nothing (and instrument returns the problem unchanged) so that a
+    search without an observer pays only for one call per expansion; see
+    RecordingStats for an observer that keeps the numbers.
+    """
+    # Return the problem to search, optionally wrapped to observe its calls.
+    def instrument(self, problem): return problem
+
+    # Return a context manager timing the named phase of the search.
+    def phase(self, name): return _NULL_PHASE
+
+    # Called once per expanded state with the number of successors generated
+    # and the frontier size after they were added.
+    def expanded(self, generated, frontier_size): pass
+
+    # Called when a state already on (or taken off) the frontier is pushed
+    # again because a cheaper path to it was found.
+    def duplicate(self): pass
+
+class _NullPhase(object):
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_PHASE = _NullPhase()
+
+class RecordingStats(SearchStats):
+    """
+    Description:
+        - SearchStats that accumulates counts and timings across the searches
+            it observes:
+            + nodes_expanded, nodes_generated, duplicate_pushes
+            + max_frontier: largest frontier size reported
+            + succ_and_cost_calls, succ_and_cost_seconds: calls into the
+                problem's succ_and_cost (and pred_and_cost) and the time spent
+                in them
+            + phase_seconds: dict mapping phase name to wall time
+    """
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.duplicate_pushes = 0
+        self.max_frontier = 0
+        self.succ_and_cost_calls = 0
+        self.succ_and_cost_seconds = 0.
+        self.phase_seconds = {}
+
+    def instrument(self, problem):
+        return _TimedProblem(problem, self)
+
+    def phase(self, name):
+        return _TimedPhase(name, self)
+
+    def expanded(self, generated, frontier_size):
+        self.nodes_expanded += 1
+        self.nodes_generated += generated
+        if frontier_size > self.max_frontier:
+            self.max_frontier = frontier_size
+
+    def duplicate(self):
+        self.duplicate_pushes += 1
+
+    def as_dict(self):
+        return {
+            'nodes_expanded': self.nodes_expanded,
+            'nodes_generated': self.nodes_generated,
+            'duplicate_pushes': self.duplicate_pushes,
+            'max_frontier': self.max_frontier,
+            'succ_and_cost_calls': self.succ_and_cost_calls,
+            'succ_and_cost_seconds': self.succ_and_cost_seconds,
+            'phase_seconds': dict(self.phase_seconds),
+        }
+
+class _TimedPhase(object):
+    def __init__(self, name, stats):
+        self.name = name
+        self.stats = stats
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        seconds = self.stats.phase_seconds
+        seconds[self.name] = seconds.get(self.name, 0.) + elapsed
+        return False
+
+class _TimedProblem(object):
+    # proxies a SearchProblem, timing calls to its successor functions
+    def __init__(self, problem, stats):
+        self.problem = problem
+        self.stats = stats
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+    def _timed(self, f, s):
+        start = time.perf_counter()
+        result = f(s)
+        self.stats.succ_and_cost_seconds += time.perf_counter() - start
+        self.stats.succ_and_cost_calls += 1
+        return result
+    def succ_and_cost(self, s): return self._timed(self.problem.succ_and_cost, s)
+    def pred_and_cost(self, s): return self._timed(self.problem.pred_and_cost, s)
+
 class SearchAlgorithm(object):
     # First, call solve on the desired SearchProblem |problem|.
     # Then it should set two things:
@@ -5,4 +111,8 @@ class SearchAlgorithm(object):
     #                 state; if no action sequence exists, set it to None.
     # - self.totalCost: the sum of the costs along the path or None if no valid
     #                   action sequence exists.
-    def solve(self, problem): raise NotImplementedError("Override me")
\ No newline at end of file
+    # While solving it reports into self.stats, a no-op SearchStats unless
+    # one (e.g., RecordingStats) is assigned before calling solve.
+    stats = SearchStats()
+
+    def solve(self, problem): raise NotImplementedError("Override me")
@@ -2,24 +2,43 @@ class SearchProblem(object):
     # Return the start state.
     def start_state(self): raise NotImplementedError("Override me")
 
+    # Return the start states; searches that support several sources seed
+    # their frontier with all of these at once.
+    def start_states(self): return [self.start_state()]
+
     # Return whether |state| is a goal state or not.
     def is_goal(self, state): raise NotImplementedError("Override me")
 
+    # Return the goal states, needed by searches that also expand backward
+    # from the goal (e.g., bidirectional search).
+    def goal_states(self): raise NotImplementedError("Override me")
+
     # Return a list of (action, newState, cost) tuples corresponding to edges
     # coming out of |state|.
     def succ_and_cost(self, state): raise NotImplementedError("Override me")
 
+    # Return a list of (action, prevState, cost) tuples corresponding to edges
+    # coming into |state|.
+    def pred_and_cost(self, state): raise NotImplementedError("Override me")
+
 """
 Examples:
 """
 
 class DAGSearchProblem(SearchProblem):
-    def __init__(self, adj, start): 
+    def __init__(self, adj, start, goals):
+        """
+        Args:
+            - adj: dict mapping each node to a list of its successors
+            - start: start node
+            - goals: set of goal nodes
+        """
         self.adj = adj
         self.start = start
-        self.goals = goals
+        self.goals = set(goals)
     def start_state(self): return self.start
     def is_goal(self, state): return state in self.goals
+    def goal_states(self): return list(self.goals)
     def succ_and_cost(self, state):
         assert state in self.adj
         cost = 1000 if (state == 3 or state == 5) else 1
@@ -27,11 +46,55 @@ class DAGSearchProblem(SearchProblem):
 
 class UndirectedGraphSearchProblem(SearchProblem):
     def __init__(self, adj, start, goals, ignores):
+        """
+        Args:
+            - adj: dict mapping each node to a list of its neighbors
+            - start: start node, or a set of start nodes
+            - goals: set of goal nodes
+            - ignores: set of nodes that may not be entered
+        """
         self.adj = adj
         self.start = start
         self.goals = goals
         self.ignores = ignores
     def start_state(self): return self.start
+    def start_states(self):
+        if isinstance(self.start, (set, frozenset)):
+            return list(self.start)
+        return [self.start]
+    def is_goal(self, s): return s in self.goals
+    def goal_states(self): return list(self.goals)
+    def succ_and_cost(self, s):
+        return [(n, n, 1) for n in self.adj[s] if n not in self.ignores]
+    # undirected, so the edges into a node are the edges out of it
+    def pred_and_cost(self, s): return self.succ_and_cost(s)
+
+class GridSearchProblem(SearchProblem):
+    def __init__(self, width, height, start, goals, walls=set(), costs=None):
+        """
+        Args:
+            - width, height: dimensions of a 4-connected grid of (x, y) states
+            - start: start cell
+            - goals: set of goal cells
+            - walls: set of cells that may not be entered
+            - costs: optional dict mapping a cell to the cost of entering it
+                (default 1)
+        """
+        self.width = width
+        self.height = height
+        self.start = start
+        self.goals = goals
+        self.walls = walls
+        self.costs = costs if costs is not None else {}
+    def start_state(self): return self.start
     def is_goal(self, s): return s in self.goals
+    def goal_states(self): return list(self.goals)
     def succ_and_cost(self, s):
-        return [(n, 1) for n in self.adj[s] if n not in self.ignores]
+        x, y = s
+        succs = []
+        for (a, ns) in [('up', (x, y + 1)), ('down', (x, y - 1)),
+                ('left', (x - 1, y)), ('right', (x + 1, y))]:
+            if (0 <= ns[0] < self.width and 0 <= ns[1] < self.height
+                    and ns not in self.walls):
+                succs.append((a, ns, self.costs.get(ns, 1)))
+        return succs
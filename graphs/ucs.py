@@ -5,48 +5,126 @@ import search_algorithm
 class UCS(search_algorithm.SearchAlgorithm):
     """
     Djikstra's
-    Time: O(nlgn) where n is states between start state and goal state in shortest path, lgn factor from the priority queue operations (heapify) 
+    Time: O(nlgn) where n is states between start state and goal state in shortest path, lgn factor from the priority queue operations (heapify)
+
+    Subclasses can override heuristic to order the frontier by cost so far plus
+    an estimate of the cost to go (see astar.AStar).
     """
+    def heuristic(self, state):
+        return 0
+
     def solve(self, problem):
-        done = set()
-        start = problem.startState()
+        stats = self.stats
+        problem = stats.instrument(problem)
+        start = problem.start_state()
         goal_state = None
+        self.cost = None
+        self.num_expanded = 0
         cache = {start:(0, start)}
-        pq = priority_queue.PriorityQueue()
-        pq.push(0, start)
-        while not pq.is_empty():
-            cost_to, s = pq.pop()
-
-            # once we pop a state skip it
-            if s in done:
-                continue
-            done.add(s)
-
-            # goal then must have traversed shortest path
-            if problem.isGoal(s):
-                self.cost, _ = cache[s]
-                goal_state = s
-                break
-
-            # add each ns to pq if cost lower now
-            for (a,ns,c) in problem.succAndCost(s):
-                total = cost_to + c
-                if ns not in cache:
-                    cache[ns] = (total, s)
-                    pq.push(total, ns)
-                elif cache[ns][0] > total:
-                    cache[ns] = (total, s)
-                    pq.push(total, ns)
+        # each state is in the queue at most once, so there are no stale
+        # entries to skip and memory is bounded by the live frontier
+        pq = priority_queue.IndexedPriorityQueue()
+        pq.push(self.heuristic(start), start)
+        with stats.phase('search'):
+            while not pq.is_empty():
+                _, s = pq.pop()
+                cost_to = cache[s][0]
+
+                # goal then must have traversed shortest path
+                if problem.is_goal(s):
+                    self.cost = cost_to
+                    goal_state = s
+                    break
+
+                # add each ns to pq or lower its priority if cost lower now
+                self.num_expanded += 1
+                succs = problem.succ_and_cost(s)
+                for (a,ns,c) in succs:
+                    total = cost_to + c
+                    if ns not in cache:
+                        cache[ns] = (total, s)
+                        pq.push(total + self.heuristic(ns), ns)
+                    elif cache[ns][0] > total:
+                        cache[ns] = (total, s)
+                        priority = total + self.heuristic(ns)
+                        stats.duplicate()
+                        if ns in pq:
+                            pq.decrease_key(ns, priority)
+                        else:
+                            # reopen ns, which was already expanded (only
+                            # possible with an inconsistent or weighted
+                            # heuristic)
+                            pq.push(priority, ns)
+                stats.expanded(len(succs), len(pq))
+
+        if goal_state is None:
+            self.actions = None
+            return
 
         # collect actions with backpointers
-        self.actions = [goal_state]
-        s = goal_state
-        while s != start:
-            ps = cache[s][1]
-            self.actions.append(ps)
-            s = ps
-        self.actions.reverse()
+        with stats.phase('backtrack'):
+            self.actions = [goal_state]
+            s = goal_state
+            while s != start:
+                ps = cache[s][1]
+                self.actions.append(ps)
+                s = ps
+            self.actions.reverse()
 
+    def solve_all(self, problem, goals=None):
+        """
+        Description:
+            - One to many mode: run Dijkstra from the start state and return a
+                dict mapping each settled state to the cost of the cheapest path
+                to it, along with a dict of backpointers (the start maps to
+                None) from which any of those paths can be read. The heuristic
+                is not used.
 
-        
+        Args:
+            - problem: SearchProblem; is_goal is not used
+            - goals: optional set of states; the search stops as soon as all
+                of them are settled instead of exhausting the graph
+        """
+        stats = self.stats
+        problem = stats.instrument(problem)
+        start = problem.start_state()
+        remaining = set(goals) if goals is not None else None
+        costs, ptrs = {}, {}
+        cache = {start:(0, None)}
+        pq = priority_queue.IndexedPriorityQueue()
+        pq.push(0, start)
+        with stats.phase('search'):
+            while not pq.is_empty():
+                cost_to, s = pq.pop()
+                costs[s], ptrs[s] = cache[s]
+                if remaining is not None:
+                    remaining.discard(s)
+                    if not remaining:
+                        break
+                succs = problem.succ_and_cost(s)
+                for (a,ns,c) in succs:
+                    if ns in costs:
+                        continue
+                    total = cost_to + c
+                    if ns not in cache:
+                        cache[ns] = (total, s)
+                        pq.push(total, ns)
+                    elif cache[ns][0] > total:
+                        cache[ns] = (total, s)
+                        stats.duplicate()
+                        pq.decrease_key(ns, total)
+                stats.expanded(len(succs), len(pq))
+        return costs, ptrs
 
+def backtrack(ptrs, s):
+    """
+    Description:
+        - Return the list of states from the start to s given the backpointers
+            returned by solve_all.
+    """
+    path = []
+    while s is not None:
+        path.append(s)
+        s = ptrs[s]
+    path.reverse()
+    return path
@@ -1,4 +1,5 @@
 
+import collections
 import itertools
 import numpy as np
 import os
@@ -7,9 +8,8 @@ import sys
 path = os.path.join(os.path.dirname(__file__), os.pardir, 'graphs')
 sys.path.append(os.path.abspath(path))
 
-import bfs
+import csr_graph
 import factors 
-import search_problem
 
 class Variable(object):
     """
@@ -34,10 +34,19 @@ class Graph(object):
         - Graph represents the graph in a markov network, it acts as a structured
             collection of variables.
     """
-    def __init__(self, edges):
+    def __init__(self, edges, cache_size=128):
+        """
+        Args:
+            - edges: dict mapping each variable to a list of its neighbors
+            - cache_size: number of conditioning sets for which to keep the
+                connected components (see components)
+        """
         self.edges = edges
         self.variables = edges.keys()
         self.domains = [v.domain for v in self.variables]
+        self._csr = None
+        self.cache_size = cache_size
+        self._components = collections.OrderedDict()
 
     def assignments(self):
         """
@@ -48,25 +57,96 @@ class Graph(object):
         for values in itertools.product(*self.domains):
             yield {var:value for (var,value) in zip(self.variables, values)}
 
+    def csr(self):
+        """
+        Description:
+            - Return the graph as a compact array backed csr_graph.CSRGraph
+                whose labels are the variables, built on first use.
+        """
+        if self._csr is None:
+            self._csr = csr_graph.CSRGraph.from_adjacency(self.edges)
+        return self._csr
+
+    def components(self, cond=frozenset()):
+        """
+        Description:
+            - Return a dict mapping each variable not in cond to an id for its
+                connected component in the graph with the variables in cond
+                removed. The result is cached per conditioning set, evicting
+                the least recently used set once more than cache_size are held.
+
+        Args:
+            - cond: set of variables to remove from the graph
+        """
+        key = frozenset(cond)
+        if key in self._components:
+            # reinsert to mark as most recently used
+            labels = self._components.pop(key)
+            self._components[key] = labels
+            return labels
+
+        labels = {}
+        for v in self.variables:
+            if v in key or v in labels:
+                continue
+            component = len(labels)
+            labels[v] = component
+            q = collections.deque([v])
+            while q:
+                s = q.popleft()
+                for n in self.edges[s]:
+                    if n not in key and n not in labels:
+                        labels[n] = component
+                        q.append(n)
+
+        self._components[key] = labels
+        if len(self._components) > self.cache_size:
+            self._components.popitem(last=False)
+        return labels
+
+    def separated(self, s1, s2, cond=frozenset()):
+        """
+        Description:
+            - Determine whether every path between s1 and s2 crosses cond,
+                using the cached components so that repeat queries cost
+                O(|s1| + |s2|). Variables in cond are separated from all others.
+
+        Args:
+            - s1: first set of variables
+            - s2: second set of variables
+            - cond: set of variables that cannot be used in a path
+        """
+        labels = self.components(cond)
+        reached = set(labels[v] for v in s1 if v in labels)
+        return not any(labels[v] in reached for v in s2 if v in labels)
+
+    def separated_batch(self, pairs, cond=frozenset()):
+        """
+        Description:
+            - Return a list with separated(s1, s2, cond) for each (s1, s2) in
+                pairs, computing the components for cond at most once.
+        """
+        self.components(cond)
+        return [self.separated(s1, s2, cond) for (s1, s2) in pairs]
+
     def path(self, src, dest, absent=set()):
         """
         Description:
             - Determine whether there exists a path between the src and dest
                 optionally without crossing any of the nodes in the absent set.
+                Returns the nodes of a shortest such path, or an empty list.
 
         Args:
             - src: set of nodes from which to begin the path
             - dest: set of nodes at which to complete the path
             - absent: set of nodes that cannot be used in the path
         """
-        algorithm = bfs.BreadthFirstSearch()
-        for s in src:
-            problem = search_problem.UndirectedGraphSearchProblem(
-                self.edges, s, dest, absent)
-            path = algorithm.solve(problem)
-            if path != []:
-                return path
-        return []
+        # a single multi-source, level synchronous search over the csr arrays
+        graph = self.csr()
+        src, dest, absent = ([graph.node_id(v) for v in nodes if v in graph.ids]
+            for nodes in (src, dest, absent))
+        return [graph.label(i)
+            for i in csr_graph.bfs_path(graph, src, dest, absent)]
 
 class MarkovNetwork(object):
 
@@ -78,7 +158,18 @@ class MarkovNetwork(object):
         """
         self.graph = graph
         self.factors = factors
-        self.partition = self._compute_partition_function()
+        self._partition = None
+
+    @property
+    def partition(self):
+        """
+        Description:
+            - The partition function, computed on first use since it sums over
+                every assignment.
+        """
+        if self._partition is None:
+            self._partition = self._compute_partition_function()
+        return self._partition
 
     def probability(self, assignment):
         """
@@ -149,4 +240,16 @@ class MarkovNetwork(object):
             - s2: second set of variables
             - cond: set of variables on which to condition
         """
-        return self.graph.path(s1, s2, cond) == []
+        return self.graph.separated(s1, s2, cond)
+
+    def conditionally_independent_batch(self, pairs, cond):
+        """
+        Description:
+            - Determines for each (s1, s2) in pairs whether s1 is independent
+                of s2 conditioning on the variables in cond.
+
+        Args:
+            - pairs: list of (s1, s2) tuples of sets of variables
+            - cond: set of variables on which to condition
+        """
+        return self.graph.separated_batch(pairs, cond)
@@ -0,0 +1,108 @@
+
+import collections.abc
+import json
+import os
+
+import numpy as np
+
+from factors import TabularFactor
+from markov_network import Graph, MarkovNetwork, Variable
+
+"""
+Compact on disk format for MarkovNetworks with tabular factors: a directory
+holding index.json, with the variables (name and domain), the neighbors of
+each variable, and the clique, shape and offset of each factor, and
+tables.npy, with every factor table flattened into one contiguous float64
+array. Loading memory maps tables.npy, so worker processes loading the same
+network share its pages, and each TabularFactor is only created (as a view
+into the map) when first accessed. Variable names and domain values must be
+strings or numbers.
+"""
+
+INDEX = 'index.json'
+TABLES = 'tables.npy'
+
+def save(network, path):
+    """
+    Description:
+        - Write a MarkovNetwork whose factors are all TabularFactors to the
+            directory path, creating it if needed.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    factors = list(network.factors.values())
+    entries, offset = [], 0
+    for factor in factors:
+        if not isinstance(factor, TabularFactor):
+            raise ValueError("only tabular factors can be saved, not {}".format(
+                type(factor).__name__))
+        entries.append({'clique': [v.name for v in factor.clique],
+            'shape': list(factor.table.shape), 'offset': offset})
+        offset += factor.table.size
+
+    # write the tables straight into the file rather than concatenating them
+    tables = np.lib.format.open_memmap(os.path.join(path, TABLES), mode='w+',
+        dtype=np.float64, shape=(offset,))
+    for (entry, factor) in zip(entries, factors):
+        tables[entry['offset']:entry['offset'] + factor.table.size] = \
+            factor.table.ravel()
+    tables.flush()
+    del tables
+
+    edges = network.graph.edges
+    index = {'variables': [{'name': v.name, 'domain': list(v.domain)}
+        for v in edges],
+        'edges': [[n.name for n in edges[v]] for v in edges],
+        'factors': entries}
+    with open(os.path.join(path, INDEX), 'w') as outfile:
+        json.dump(index, outfile)
+
+class LazyFactors(collections.abc.Mapping):
+    """
+    Description:
+        - Read only dict mapping cliques (tuples of variables) to the
+            TabularFactors of a saved network, each created on first access as
+            a view into the memory mapped tables.
+    """
+    def __init__(self, cliques, entries, tables):
+        self.entries = dict(zip(cliques, entries))
+        self.tables = tables
+        self._factors = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, clique):
+        if clique not in self._factors:
+            entry = self.entries[clique]
+            size = int(np.prod(entry['shape']))
+            table = self.tables[entry['offset']:entry['offset'] + size]
+            self._factors[clique] = TabularFactor(clique,
+                table.reshape(entry['shape']))
+        return self._factors[clique]
+
+def load(path, mmap=True):
+    """
+    Description:
+        - Return the MarkovNetwork saved in the directory path, with its
+            factors created lazily (see LazyFactors).
+
+    Args:
+        - path: directory written by save
+        - mmap: whether to memory map the tables rather than read them
+    """
+    with open(os.path.join(path, INDEX)) as infile:
+        index = json.load(infile)
+    tables = np.load(os.path.join(path, TABLES),
+        mmap_mode='r' if mmap else None)
+    variables = [Variable(v['name'], v['domain']) for v in index['variables']]
+    by_name = {v.name: v for v in variables}
+    edges = {v: [by_name[n] for n in neighbors]
+        for (v, neighbors) in zip(variables, index['edges'])}
+    cliques = [tuple(by_name[n] for n in entry['clique'])
+        for entry in index['factors']]
+    return MarkovNetwork(Graph(edges),
+        LazyFactors(cliques, index['factors'], tables))